@@ -1,21 +1,60 @@
+import threading
+
 import numpy as np
 import cv2
 
-try:
-    import mediapipe as mp  # type: ignore
-
-    _mp_face_mesh = mp.solutions.face_mesh
-    # Reutilizamos la misma instancia para evitar crearla en cada frame
-    _face_mesh = _mp_face_mesh.FaceMesh(
-        static_image_mode=False,
-        max_num_faces=1,
-        refine_landmarks=True,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5,
-    )
-except (ImportError, AttributeError):
-    # Si MediaPipe no está instalado o falla la inicialización, continuamos con None.
-    _face_mesh = None
+from metrics import MetricasSesion
+
+# MediaPipe se importa la primera vez que se necesita: importarlo cuesta
+# segundos y no hace falta para arrancar el servidor.
+_NO_CARGADO = object()
+_mp_face_mesh = _NO_CARGADO
+_carga_mp = threading.Lock()
+
+# FaceMesh no es seguro entre hilos: cada hilo del pool de inferencia
+# reutiliza su propia instancia para evitar crearla en cada frame. Un mismo
+# hilo atiende frames de sesiones distintas, así que la instancia trabaja en
+# modo imagen estática: en modo seguimiento partiría de la cara del frame
+# anterior, que puede ser la de otra sesión.
+_local = threading.local()
+
+def _modulo_face_mesh():
+    """``mp.solutions.face_mesh`` o None si MediaPipe no está disponible."""
+    global _mp_face_mesh
+    if _mp_face_mesh is _NO_CARGADO:
+        with _carga_mp:
+            if _mp_face_mesh is _NO_CARGADO:
+                try:
+                    import mediapipe as mp  # type: ignore
+
+                    _mp_face_mesh = mp.solutions.face_mesh
+                except (ImportError, AttributeError):
+                    # Si MediaPipe no está instalado, continuamos sin contacto visual.
+                    _mp_face_mesh = None
+    return _mp_face_mesh
+
+def _get_face_mesh():
+    """Instancia de FaceMesh del hilo actual (o None si no está disponible)."""
+    global _mp_face_mesh
+    modulo = _modulo_face_mesh()
+    if modulo is None:
+        return None
+    face_mesh = getattr(_local, "face_mesh", None)
+    if face_mesh is None:
+        try:
+            face_mesh = modulo.FaceMesh(
+                static_image_mode=True,
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5,
+            )
+        except (AttributeError, RuntimeError):
+            # Si falla la inicialización no volvemos a intentarlo.
+            _mp_face_mesh = None
+            return None
+        _local.face_mesh = face_mesh
+    return face_mesh
 
 def analyze_posture(bbox):
     """Analizar postura basada en bounding box"""
@@ -60,29 +99,31 @@ def calculate_fluency(metricas):
     return max(1, min(10, base_fluency + np.random.uniform(-1, 1)))
 
 def reset_metrics():
-    """Reiniciar todas las métricas"""
-    return {
-        'frames_totales': 0,
-        'frames_contacto': 0,
-        'gestos_totales': 0,
-        'distancias_mov': [],
-        'volumen_voz': [],
-        'pausas_detectadas': 0,
-        'palabras_por_minuto': 0,
-        'postura_evaluacion': [],
-        'expresiones_faciales': {'neutral': 0, 'sonrisa': 0, 'seria': 0},
-        'tiempo_hablando': 0,
-        'tiempo_silencio': 0,
-        'cambios_postura': 0,
-        'uso_espacio': {'izquierda': 0, 'centro': 0, 'derecha': 0},
-        'contacto_por_tiempo': [],
-        'gestos_por_tiempo': [],
-        'mov_por_tiempo': [],
-        'postura_por_tiempo': [],
-        'fluidez_por_tiempo': []
-    } 
-
-def analyze_eye_contact(frame, yaw_threshold: float = 0.08) -> bool | None:
+    """Reiniciar todas las métricas (contenedor compacto, ver metrics.MetricasSesion)"""
+    return MetricasSesion()
+
+# Fracción superior de la caja de la persona donde se busca la cara (cabeza y hombros)
+FRACCION_CABEZA = 0.45
+# Tamaño mínimo (px) del recorte para que FaceMesh tenga algo que analizar
+RECORTE_MINIMO = 32
+
+def recorte_cabeza(bbox, ancho, alto, margen=0.1):
+    """Región ``(x1, y1, x2, y2)`` enteros de la parte superior de la persona.
+
+    Devuelve None si el recorte queda demasiado pequeño.
+    """
+    x1, y1, x2, y2 = bbox[:4]
+    w = x2 - x1
+    h = y2 - y1
+    rx1 = int(max(0, x1 - w * margen))
+    rx2 = int(min(ancho, x2 + w * margen))
+    ry1 = int(max(0, y1 - h * margen))
+    ry2 = int(min(alto, y1 + h * FRACCION_CABEZA))
+    if rx2 - rx1 < RECORTE_MINIMO or ry2 - ry1 < RECORTE_MINIMO:
+        return None
+    return rx1, ry1, rx2, ry2
+
+def analyze_eye_contact(frame, yaw_threshold: float = 0.08, bbox=None) -> bool | None:
     """Determina si el orador mantiene contacto visual aproximado.
 
     Parámetros
@@ -92,6 +133,10 @@ def analyze_eye_contact(frame, yaw_threshold: float = 0.08) -> bool | None:
     yaw_threshold : float
         Umbral (normalizado) de desviación lateral del eje de la nariz respecto
         al centro de los ojos para considerar que mira al frente.
+    bbox : tuple | None
+        Caja ``(x1, y1, x2, y2, ...)`` de la persona detectada por YOLO. Si se
+        indica, FaceMesh solo procesa la parte superior de la caja y los
+        landmarks se llevan de vuelta a coordenadas del frame completo.
 
     Returns
     -------
@@ -100,12 +145,22 @@ def analyze_eye_contact(frame, yaw_threshold: float = 0.08) -> bool | None:
         • False → No se detecta contacto visual.
         • None  → No se pudo determinar (MediaPipe no disponible o no se detecta rostro).
     """
-    if _face_mesh is None:
+    face_mesh = _get_face_mesh()
+    if face_mesh is None:
         return None
 
+    alto, ancho = frame.shape[:2]
+    # Región analizada: frame completo o recorte de cabeza y hombros
+    rx1, ry1, rx2, ry2 = 0, 0, ancho, alto
+    if bbox is not None:
+        region = recorte_cabeza(bbox, ancho, alto)
+        if region is None:
+            return False
+        rx1, ry1, rx2, ry2 = region
+
     # Conversión BGR → RGB (MediaPipe trabaja en RGB)
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = _face_mesh.process(rgb)
+    rgb = cv2.cvtColor(frame[ry1:ry2, rx1:rx2], cv2.COLOR_BGR2RGB)
+    result = face_mesh.process(rgb)
 
     if not result.multi_face_landmarks:
         return False
@@ -118,15 +173,19 @@ def analyze_eye_contact(frame, yaw_threshold: float = 0.08) -> bool | None:
     LEFT_EYE_OUTER = 33
     RIGHT_EYE_OUTER = 263
 
-    nose = face_landmarks[NOSE_TIP]
-    left_eye = face_landmarks[LEFT_EYE_OUTER]
-    right_eye = face_landmarks[RIGHT_EYE_OUTER]
+    # Landmarks normalizados al recorte → normalizados al frame completo,
+    # para que el umbral signifique lo mismo con o sin recorte
+    escala_x = (rx2 - rx1) / ancho
+    desplazamiento_x = rx1 / ancho
+    nose_x = desplazamiento_x + face_landmarks[NOSE_TIP].x * escala_x
+    left_eye_x = desplazamiento_x + face_landmarks[LEFT_EYE_OUTER].x * escala_x
+    right_eye_x = desplazamiento_x + face_landmarks[RIGHT_EYE_OUTER].x * escala_x
 
     # Centro horizontal de los ojos
-    eyes_center_x = (left_eye.x + right_eye.x) / 2.0
+    eyes_center_x = (left_eye_x + right_eye_x) / 2.0
 
     # Si la proyección horizontal de la nariz está cerca del centro de los ojos
     # asumimos que la cabeza está orientada al frente.
-    if abs(nose.x - eyes_center_x) < yaw_threshold:
+    if abs(nose_x - eyes_center_x) < yaw_threshold:
         return True
-    return False 
\ No newline at end of file
+    return False
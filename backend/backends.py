@@ -0,0 +1,116 @@
+"""Backends de inferencia en CPU para los modelos YOLO.
+
+Ultralytics puede ejecutar el mismo modelo con PyTorch, con un ``.onnx`` a
+través de ONNX Runtime o con un directorio ``*_openvino_model`` de OpenVINO.
+Aquí se prepara (exporta una sola vez) el artefacto del backend elegido, con
+una variante INT8 opcional, y se ajustan los hilos de cada motor.
+"""
+import os
+import threading
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+_exportando = threading.Lock()
+
+
+def _base(ruta_pt):
+    return os.path.splitext(ruta_pt)[0]
+
+
+def ruta_artefacto(ruta_pt, backend, int8=False):
+    """Ruta del modelo exportado para ``backend`` (exista o no todavía)."""
+    if backend == "pytorch":
+        return ruta_pt
+    if backend == "onnx":
+        return f"{_base(ruta_pt)}{'_int8' if int8 else ''}.onnx"
+    if backend == "openvino":
+        return f"{_base(ruta_pt)}{'_int8' if int8 else ''}_openvino_model"
+    raise ValueError(f"Backend de inferencia desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+
+
+def preparar_modelo(ruta_pt, backend="pytorch", int8=False, imgsz=640):
+    """Devuelve la ruta que debe cargar ``YOLO(...)`` para ``backend``.
+
+    Si el artefacto no existe se exporta a partir de ``ruta_pt``. Los modelos
+    se exportan con batch dinámico para que sirvan al micro-batching.
+    INT8: en ONNX se cuantizan los pesos de forma dinámica (onnxruntime); en
+    OpenVINO se usa la cuantización con calibración de ultralytics.
+    """
+    destino = ruta_artefacto(ruta_pt, backend, int8)
+    # PyTorch carga el .pt tal cual (ultralytics lo descarga si falta)
+    if backend == "pytorch" or os.path.exists(destino):
+        return destino
+
+    # Varios hilos de inferencia pueden pedir el modelo a la vez: se exporta una vez
+    with _exportando:
+        if os.path.exists(destino):
+            return destino
+
+        from ultralytics import YOLO
+
+        print(f"⚙️ Exportando {ruta_pt} para {backend}{' INT8' if int8 else ''}...")
+        if backend == "onnx":
+            exportado = YOLO(ruta_pt).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+            if int8:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                quantize_dynamic(exportado, destino, weight_type=QuantType.QUInt8)
+            elif os.path.abspath(exportado) != os.path.abspath(destino):
+                os.replace(exportado, destino)
+        elif backend == "openvino":
+            exportado = YOLO(ruta_pt).export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8)
+            if os.path.abspath(exportado) != os.path.abspath(destino):
+                os.replace(exportado, destino)
+    return destino
+
+
+def configurar_hilos(hilos):
+    """Limita los hilos de PyTorch y OpenCV del proceso.
+
+    Cada hilo del pool de inferencia (o cada proceso del análisis offline)
+    ejecuta su propio modelo, así que el total de hilos de CPU es
+    ``workers × hilos``. Es el único sitio donde se fijan estos límites.
+    """
+    import cv2
+
+    cv2.setNumThreads(hilos)
+    try:
+        import torch
+
+        torch.set_num_threads(hilos)
+    except ImportError:
+        pass
+
+
+def ajustar_hilos_modelo(modelo, ruta, hilos):
+    """Aplica ``hilos`` a la sesión de ONNX Runtime u OpenVINO de un modelo ya cargado.
+
+    Ultralytics crea esas sesiones con la configuración por defecto (todos los
+    núcleos) en el primer ``predict``; aquí se recrean desde ``ruta`` con el
+    límite de hilos. Si la versión de ultralytics no expone esos atributos no
+    se hace nada.
+    """
+    backend = getattr(getattr(modelo, "predictor", None), "model", None)
+    if backend is None:
+        return
+
+    sesion = getattr(backend, "session", None)
+    if sesion is not None and str(ruta).endswith(".onnx"):
+        import onnxruntime as ort
+
+        opciones = ort.SessionOptions()
+        opciones.intra_op_num_threads = hilos
+        opciones.inter_op_num_threads = 1
+        backend.session = ort.InferenceSession(ruta, sess_options=opciones, providers=sesion.get_providers())
+        return
+
+    if getattr(backend, "ov_compiled_model", None) is not None:
+        import glob
+
+        import openvino as ov
+
+        xml = glob.glob(os.path.join(ruta, "*.xml"))
+        if xml:
+            backend.ov_compiled_model = ov.Core().compile_model(
+                xml[0], "CPU", {"INFERENCE_NUM_THREADS": hilos}
+            )
@@ -1,37 +1,177 @@
+import asyncio
 import cv2
+import numpy as np
 import threading
 import platform
+import time
+
+# Buffers preasignados del anillo de captura (crece si todos están prestados)
+TAMANO_ANILLO = 4
+
+def abrir_captura(src):
+    """``cv2.VideoCapture`` configurado para baja latencia (índice local o URL)."""
+    # Usar CAP_DSHOW en Windows para una inicialización de cámara más rápida
+    if platform.system() == "Windows" and isinstance(src, int):
+        cap = cv2.VideoCapture(src, cv2.CAP_DSHOW)
+    else:
+        cap = cv2.VideoCapture(src)
+    # Minimizar buffer y latencia
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+    cap.set(cv2.CAP_PROP_FPS, 15)
+    return cap
 
 class ThreadedCamera:
+    """Captura en un hilo que publica cada frame con número de secuencia y hora de captura.
+
+    Los consumidores esperan el siguiente frame con ``read_next()`` (asyncio) o
+    ``wait_next()`` (hilos) en lugar de sondear, así cada frame se entrega una
+    sola vez. ``descartados`` cuenta los frames capturados que nadie llegó a
+    leer y ``duplicados`` las lecturas con ``read()`` de un frame ya entregado.
+
+    Los frames se capturan sobre un anillo de buffers preasignados
+    (``cap.read(image=buf)``), sin reservar memoria por frame. El frame que
+    entregan ``read_next``/``wait_next`` queda prestado: la captura no lo
+    reutiliza hasta que el consumidor lo devuelve con ``release(frame)``, y
+    mientras tanto puede dibujar sobre él.
+    """
+
     def __init__(self, src):
-        # Usar CAP_DSHOW en Windows para una inicialización de cámara más rápida
-        if platform.system() == "Windows" and isinstance(src, int):
-            self.cap = cv2.VideoCapture(src, cv2.CAP_DSHOW)
-        else:
-            self.cap = cv2.VideoCapture(src)
-        # Minimizar buffer y latencia
-        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
-        self.cap.set(cv2.CAP_PROP_FPS, 15)
+        self.cap = abrir_captura(src)
+        self._iniciar_estado()
 
+    def _iniciar_estado(self):
         self.stopped = False
         self.frame = None
+        self.seq = 0            # secuencia del último frame capturado (0 = ninguno)
+        self.timestamp = None   # time.time() de su captura
+        self.descartados = 0
+        self.duplicados = 0
+        self._entregado = 0     # secuencia del último frame entregado
+        self._buffers = []      # anillo de captura (se crea con el primer frame)
+        self._prestados = []    # préstamos pendientes de cada buffer
+        self._actual = None     # índice del buffer publicado
+        self._cond = threading.Condition()
+        # Aviso al event loop del consumidor asíncrono (read_next)
+        self._loop = None
+        self._evento = None
 
     def start(self):
+        """Arranca la captura; devuelve None si la cámara no se pudo abrir."""
+        if not self.cap.isOpened():
+            self.cap.release()
+            return None
         threading.Thread(target=self._update, daemon=True).start()
         return self
 
+    def _buffer_libre(self):
+        """Índice de un buffer que ni está publicado ni prestado. Llamar con ``_cond`` tomado."""
+        if not self._buffers:
+            return None
+        for i, prestamos in enumerate(self._prestados):
+            if prestamos == 0 and i != self._actual:
+                return i
+        self._buffers.append(np.empty_like(self._buffers[0]))
+        self._prestados.append(0)
+        return len(self._buffers) - 1
+
     def _update(self):
         while not self.stopped:
-            ret, fr = self.cap.read()
-            if ret:
+            with self._cond:
+                i = self._buffer_libre()
+            # El buffer elegido no es visible para los consumidores: se escribe sin lock
+            ret, fr = self.cap.read() if i is None else self.cap.read(self._buffers[i])
+            if not ret:
+                continue
+            with self._cond:
+                if i is None:
+                    # Primer frame: define la forma de los buffers del anillo
+                    self._buffers = [fr] + [np.empty_like(fr) for _ in range(TAMANO_ANILLO - 1)]
+                    self._prestados = [0] * TAMANO_ANILLO
+                    i = 0
+                elif fr is not self._buffers[i]:
+                    self._buffers[i] = fr  # cambió la resolución: OpenCV reservó otro array
+                self._actual = i
                 self.frame = fr
+                self.seq += 1
+                self.timestamp = time.time()
+                self._cond.notify_all()
+            self._avisar_loop()
         self.cap.release()
+        with self._cond:
+            self._cond.notify_all()
+        self._avisar_loop()
+
+    def _avisar_loop(self):
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._evento.set)
+            except RuntimeError:
+                pass  # el loop ya se cerró
+
+    def _entregar(self):
+        """Presta el frame actual al consumidor. Llamar con ``_cond`` tomado."""
+        self.descartados += self.seq - self._entregado - 1
+        self._entregado = self.seq
+        self._prestados[self._actual] += 1
+        return self.seq, self.timestamp, self.frame
+
+    def release(self, frame):
+        """Devuelve al anillo un frame prestado por ``read_next``/``wait_next``."""
+        with self._cond:
+            for i, buf in enumerate(self._buffers):
+                if buf is frame:
+                    self._prestados[i] = max(0, self._prestados[i] - 1)
+                    return
 
     def read(self):
-        return self.frame
+        """Copia del último frame capturado (aunque ya se haya leído), o None."""
+        with self._cond:
+            if self.seq == 0:
+                return None
+            if self.seq == self._entregado:
+                self.duplicados += 1
+            else:
+                self.descartados += self.seq - self._entregado - 1
+                self._entregado = self.seq
+            # Copia: el buffer del anillo se reutilizará en otra captura
+            return self.frame.copy()
+
+    def wait_next(self, timeout=None):
+        """Bloquea hasta un frame no entregado: ``(seq, timestamp, frame)`` o None (timeout / parada).
+
+        El frame queda prestado hasta ``release(frame)``.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > self._entregado or self.stopped, timeout):
+                return None
+            if self.seq == self._entregado:
+                return None
+            return self._entregar()
+
+    async def read_next(self, timeout=None):
+        """Versión asíncrona de ``wait_next``: espera sin bloquear el event loop."""
+        if self._loop is None:
+            self._evento = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+        while True:
+            # Se limpia el aviso antes de mirar: un frame que llegue después
+            # volverá a activarlo y no se pierde.
+            self._evento.clear()
+            with self._cond:
+                if self.seq > self._entregado:
+                    return self._entregar()
+            if self.stopped:
+                return None
+            try:
+                await asyncio.wait_for(self._evento.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
 
     def stop(self):
-        self.stopped = True 
\ No newline at end of file
+        self.stopped = True
+        with self._cond:
+            self._cond.notify_all()
+        self._avisar_loop()
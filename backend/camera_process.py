@@ -0,0 +1,282 @@
+"""Captura de cámara en un proceso hijo con entrega por memoria compartida.
+
+``ProcessCamera`` ejecuta ``cv2.VideoCapture`` (cámara local o el stream
+``http://{ip}/video``) y la decodificación MJPG en un proceso aparte, fuera
+del GIL del servidor. El hijo escribe cada frame en uno de ``N_SLOTS`` huecos
+de un bloque ``multiprocessing.shared_memory`` y publica su cabecera
+(secuencia, hora de captura y forma); el servidor lo recibe sin copias con la
+misma interfaz que ``ThreadedCamera`` (``read_next``, ``wait_next``,
+``release``...). Con varias cámaras cada una decodifica en su propio proceso.
+
+Se elige con ``ORATOR_CAPTURA=proceso`` o con ``"captura": "proceso"`` en la
+configuración de la sesión.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from camera import ThreadedCamera, abrir_captura
+
+# "hilo" → ThreadedCamera; "proceso" → ProcessCamera
+CAPTURA = os.environ.get("ORATOR_CAPTURA", "hilo")
+N_SLOTS = 4
+# Segundos para que el hijo abra la cámara y entregue el primer frame
+ESPERA_ARRANQUE = 15.0
+
+# Cabecera global (último frame publicado) y cabecera de cada hueco
+CABECERA = np.dtype([('seq', '<u8'), ('slot', '<i4'), ('reservado', '<i4')])
+SLOT = np.dtype([
+    ('seq', '<u8'), ('t', '<f8'),
+    ('alto', '<u4'), ('ancho', '<u4'), ('canales', '<u4'),
+    ('prestado', '<i4'),  # préstamos del servidor: el hijo no escribe en ese hueco
+])
+ALINEACION = 64
+
+
+class _Memoria:
+    """Vistas NumPy sobre el bloque compartido: cabeceras y datos de cada hueco."""
+
+    def __init__(self, shm, n_slots, capacidad):
+        self.cabecera = np.ndarray((), CABECERA, buffer=shm.buf)
+        self.slots = np.ndarray((n_slots,), SLOT, buffer=shm.buf, offset=CABECERA.itemsize)
+        inicio = self._inicio_datos(n_slots)
+        self.datos = [
+            np.ndarray((capacidad,), np.uint8, buffer=shm.buf, offset=inicio + i * capacidad)
+            for i in range(n_slots)
+        ]
+
+    @staticmethod
+    def _inicio_datos(n_slots):
+        fin = CABECERA.itemsize + n_slots * SLOT.itemsize
+        return -(-fin // ALINEACION) * ALINEACION
+
+    @classmethod
+    def tamano(cls, n_slots, capacidad):
+        return cls._inicio_datos(n_slots) + n_slots * capacidad
+
+    def vista(self, slot, forma=None):
+        """Frame del hueco ``slot`` (sin copiar) con la forma de su cabecera o ``forma``."""
+        if forma is None:
+            s = self.slots[slot]
+            forma = (int(s['alto']), int(s['ancho']), int(s['canales']))
+        return self.datos[slot][:int(np.prod(forma))].reshape(forma)
+
+    def libre(self):
+        """Hueco que ni está publicado ni prestado, o None. Llamar con el lock tomado."""
+        publicado = int(self.cabecera['slot']) if int(self.cabecera['seq']) else -1
+        for i in range(len(self.slots)):
+            if i != publicado and int(self.slots[i]['prestado']) == 0:
+                return i
+        return None
+
+
+def _capturar(src, conexion, cond, parar):
+    """Proceso hijo: captura frames y los publica en la memoria compartida."""
+    padre = os.getppid()
+    cap = abrir_captura(src)
+    shm = mem = None
+    try:
+        if not cap.isOpened():
+            conexion.send(("error", f"No se pudo abrir la cámara: {src}"))
+            return
+        ret, primero = cap.read()
+        while not ret and not parar.is_set():
+            ret, primero = cap.read()
+        if not ret:
+            return
+        forma = primero.shape
+        conexion.send(("forma", forma))
+        nombre, n_slots = conexion.recv()
+        shm = shared_memory.SharedMemory(name=nombre)
+        mem = _Memoria(shm, n_slots, primero.nbytes)
+
+        seq = 0
+        while not parar.is_set() and os.getppid() == padre:
+            with cond:
+                slot = mem.libre()
+            if slot is None:
+                cap.grab()  # todos los huecos prestados: se descarta este frame
+                continue
+            destino = mem.vista(slot, forma)
+            if primero is not None:
+                np.copyto(destino, primero)
+                primero = None
+            else:
+                # Escritura sin lock: el hueco elegido no es visible para el servidor
+                ret, leido = cap.read(destino)
+                if not ret:
+                    continue
+                if leido is not destino:
+                    # La fuente cambió de resolución: se ajusta al tamaño del hueco
+                    cv2.resize(leido, (forma[1], forma[0]), dst=destino)
+
+            seq += 1
+            with cond:
+                cabecera = mem.slots[slot]
+                cabecera['seq'] = seq
+                cabecera['t'] = time.time()
+                cabecera['alto'], cabecera['ancho'], cabecera['canales'] = forma
+                mem.cabecera['seq'] = seq
+                mem.cabecera['slot'] = slot
+                cond.notify_all()
+    finally:
+        cap.release()
+        mem = destino = cabecera = None
+        if shm is not None:
+            shm.close()
+
+
+class ProcessCamera(ThreadedCamera):
+    """``ThreadedCamera`` cuya captura corre en un proceso hijo.
+
+    Un hilo receptor espera las publicaciones del hijo y las entrega con la
+    misma lógica de secuencias de ``ThreadedCamera``. Los frames que entrega
+    ``read_next``/``wait_next`` son vistas de la memoria compartida prestadas
+    hasta ``release(frame)``.
+    """
+
+    def __init__(self, src):
+        self.src = src
+        self._iniciar_estado()
+        self._proceso = None
+        self._parar = None
+        self._cond_mp = None
+        self._shm = None
+        self._mem = None
+        self._prestamos = {}  # id(frame) -> hueco
+
+    def start(self):
+        """Lanza el proceso de captura; devuelve None si la cámara no arranca."""
+        contexto = multiprocessing.get_context("spawn")
+        self._conexion, hijo = contexto.Pipe()
+        self._cond_mp = contexto.Condition()
+        self._parar = contexto.Event()
+        self._proceso = contexto.Process(
+            target=_capturar, args=(self.src, hijo, self._cond_mp, self._parar), daemon=True
+        )
+        self._proceso.start()
+        hijo.close()
+
+        try:
+            if not self._conexion.poll(ESPERA_ARRANQUE):
+                raise EOFError("sin respuesta del proceso de captura")
+            tipo, valor = self._conexion.recv()
+        except EOFError as e:
+            tipo, valor = "error", str(e)
+        if tipo == "error":
+            print(f"❌ {valor}")
+            self._terminar()
+            return None
+
+        capacidad = int(np.prod(valor))
+        self._shm = shared_memory.SharedMemory(create=True, size=_Memoria.tamano(N_SLOTS, capacidad))
+        self._mem = _Memoria(self._shm, N_SLOTS, capacidad)
+        self._conexion.send((self._shm.name, N_SLOTS))
+        threading.Thread(target=self._update, daemon=True).start()
+        return self
+
+    def _update(self):
+        """Hilo receptor: traslada las publicaciones del hijo al estado local."""
+        visto = 0
+        cabecera = self._mem.cabecera
+        while not self.stopped and self._proceso.is_alive():
+            with self._cond_mp:
+                self._cond_mp.wait_for(lambda: int(cabecera['seq']) > visto or self._parar.is_set(), 0.5)
+                seq = int(cabecera['seq'])
+                slot = int(cabecera['slot'])
+                t = float(self._mem.slots[slot]['t'])
+            if seq <= visto:
+                continue
+            visto = seq
+            with self._cond:
+                self.seq = max(self.seq, seq)
+                self.timestamp = t
+                self._actual = slot
+                self._cond.notify_all()
+            self._avisar_loop()
+
+        self.stopped = True
+        with self._cond:
+            self._cond.notify_all()
+        self._avisar_loop()
+        self._terminar()
+        cabecera = None  # suelta la vista para poder cerrar el bloque compartido
+        self._liberar_memoria()
+
+    def _entregar(self):
+        """Presta el último frame publicado. Llamar con ``_cond`` tomado."""
+        with self._cond_mp:
+            seq = int(self._mem.cabecera['seq'])
+            slot = int(self._mem.cabecera['slot'])
+            cabecera = self._mem.slots[slot]
+            cabecera['prestado'] += 1
+            t = float(cabecera['t'])
+            frame = self._mem.vista(slot)
+        # Puede ser más reciente que el que vio el hilo receptor
+        self.seq = max(self.seq, seq)
+        self.descartados += seq - self._entregado - 1
+        self._entregado = seq
+        self._prestamos[id(frame)] = slot
+        return seq, t, frame
+
+    def release(self, frame):
+        slot = self._prestamos.pop(id(frame), None)
+        if slot is None or self._mem is None:
+            return
+        with self._cond_mp:
+            cabecera = self._mem.slots[slot]
+            cabecera['prestado'] = max(0, int(cabecera['prestado']) - 1)
+
+    def read(self):
+        """Copia del último frame publicado, o None."""
+        with self._cond:
+            if self._mem is None:
+                return None
+            with self._cond_mp:
+                seq = int(self._mem.cabecera['seq'])
+                if seq == 0:
+                    return None
+                frame = self._mem.vista(int(self._mem.cabecera['slot'])).copy()
+            if seq == self._entregado:
+                self.duplicados += 1
+            else:
+                self.descartados += seq - self._entregado - 1
+                self._entregado = seq
+            return frame
+
+    def _terminar(self):
+        if self._parar is not None:
+            self._parar.set()
+        if self._proceso is not None:
+            self._proceso.join(timeout=2)
+            if self._proceso.is_alive():
+                self._proceso.terminate()
+
+    def _liberar_memoria(self):
+        with self._cond:
+            self._mem = None
+            self._entregado = self.seq
+        if self._shm is None:
+            return
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # quedan frames prestados: el mapeo se libera cuando se suelten
+        self._shm.unlink()
+        self._shm = None
+
+    def stop(self):
+        if self._parar is not None:
+            self._parar.set()
+        super().stop()
+
+
+def crear_camara(src, captura=CAPTURA):
+    """Cámara arrancada con el backend de captura pedido ("hilo" o "proceso"), o None."""
+    clase = ProcessCamera if captura == "proceso" else ThreadedCamera
+    return clase(src).start()
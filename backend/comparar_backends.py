@@ -0,0 +1,140 @@
+"""Comparación de precisión y latencia entre backends de inferencia.
+
+Procesa un clip local con cada backend (PyTorch, ONNX Runtime, OpenVINO y sus
+variantes INT8) usando el mismo pipeline que el análisis en vivo, mide la
+latencia por frame y compara las métricas de postura, uso del espacio,
+movimiento y contacto visual con las del primer backend (referencia).
+
+Uso:
+    python comparar_backends.py clip.mp4 --frames 300 --hilos 4
+    python comparar_backends.py clip.mp4 --backends pytorch onnx-int8 openvino
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import inference
+from analysis import reset_metrics
+from backends import configurar_hilos
+from pipeline import FrameAnalyzer
+
+OPCIONES = ("pytorch", "onnx", "onnx-int8", "openvino", "openvino-int8")
+
+# Diferencia máxima admitida respecto a la referencia
+TOLERANCIAS = {
+    'postura': 0.5,        # puntos sobre 10
+    'centro_pct': 5.0,     # puntos porcentuales
+    'izquierda_pct': 5.0,
+    'derecha_pct': 5.0,
+    'contacto_pct': 5.0,
+    'movimiento': 0.2,     # relativo (20 %)
+}
+
+
+def leer_frames(ruta, max_frames):
+    """Decodifica el clip en memoria para no medir el decode en la latencia."""
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        raise ValueError(f"No se pudo abrir el video: {ruta}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames, fps
+
+
+def resumir(metricas):
+    """Métricas finales comparables entre backends."""
+    posturas = np.asarray(metricas.postura_evaluacion, dtype=float)
+    distancias = np.asarray(metricas.distancias_mov, dtype=float)
+    total_espacio = max(1, sum(metricas.uso_espacio.values()))
+    return {
+        'postura': float(posturas.mean()) if posturas.size else 5.0,
+        'centro_pct': metricas.uso_espacio['centro'] / total_espacio * 100,
+        'izquierda_pct': metricas.uso_espacio['izquierda'] / total_espacio * 100,
+        'derecha_pct': metricas.uso_espacio['derecha'] / total_espacio * 100,
+        'contacto_pct': metricas.frames_contacto / max(1, metricas.frames_totales) * 100,
+        'movimiento': float(distancias.mean()) if distancias.size else 0.0,
+    }
+
+
+def medir(opcion, frames, fps, hilos):
+    backend, _, variante = opcion.partition("-")
+    inference.configurar_backend(backend, variante == "int8", hilos)
+    inference.descartar_modelo()
+    inference.obtener_modelo()  # carga, exportación y calentamiento fuera de la medida
+
+    metricas = reset_metrics()
+    analizador = FrameAnalyzer(metricas, {'analisis_avanzado': False})
+    latencias = []
+    for i, frame in enumerate(frames):
+        inicio = time.perf_counter()
+        analizador.procesar(frame, i / fps)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    latencias = np.asarray(latencias)
+    return {
+        'media_ms': float(latencias.mean()),
+        'p95_ms': float(np.percentile(latencias, 95)),
+        'metricas': resumir(metricas),
+    }
+
+
+def dentro_de_tolerancia(metricas, referencia):
+    for clave, tolerancia in TOLERANCIAS.items():
+        diferencia = abs(metricas[clave] - referencia[clave])
+        if clave == 'movimiento':
+            diferencia /= max(1e-6, referencia[clave])
+        if diferencia > tolerancia:
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara backends de inferencia sobre un clip local")
+    parser.add_argument("clip", help="Video de prueba")
+    parser.add_argument("--backends", nargs="+", default=list(OPCIONES), choices=OPCIONES)
+    parser.add_argument("--frames", type=int, default=300, help="Frames del clip a procesar")
+    parser.add_argument("--hilos", type=int, default=inference.BACKEND_THREADS, help="Hilos por modelo")
+    args = parser.parse_args(argv)
+
+    configurar_hilos(args.hilos)
+    frames, fps = leer_frames(args.clip, args.frames)
+    print(f"🎬 {len(frames)} frames de {args.clip}, {args.hilos} hilos\n")
+
+    resultados = {}
+    for opcion in args.backends:
+        try:
+            resultados[opcion] = medir(opcion, frames, fps, args.hilos)
+        except Exception as e:
+            print(f"❌ {opcion}: {e}")
+
+    if not resultados:
+        return 1
+
+    referencia = next(iter(resultados.values()))['metricas']
+    print(f"{'backend':<15}{'media ms':>10}{'p95 ms':>10}{'postura':>9}{'centro %':>10}{'mov px':>9}{'contacto %':>12}  tolerancia")
+    aptos = []
+    for opcion, r in resultados.items():
+        m = r['metricas']
+        ok = dentro_de_tolerancia(m, referencia)
+        if ok:
+            aptos.append((r['media_ms'], opcion))
+        print(
+            f"{opcion:<15}{r['media_ms']:>10.1f}{r['p95_ms']:>10.1f}{m['postura']:>9.2f}"
+            f"{m['centro_pct']:>10.1f}{m['movimiento']:>9.1f}{m['contacto_pct']:>12.1f}  {'✅' if ok else '❌'}"
+        )
+
+    if aptos:
+        print(f"\n🏁 Backend más rápido dentro de tolerancia: {min(aptos)[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+"""Historial de sesiones completadas en SQLite.
+
+Cada sesión terminada guarda su resumen (puntuación general, contacto visual,
+gestos por segundo, movimiento, postura y uso del espacio) en ``sesiones``.
+En la misma transacción se actualizan los acumulados por usuario y día
+(``resumen_diario``) y por usuario y semana ISO (``resumen_semanal``), de modo
+que las tendencias se leen de tablas pequeñas indexadas por su clave
+primaria sin recorrer las sesiones.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+RUTA_HISTORIAL = os.environ.get("ORATOR_HISTORIAL", "historial.db")
+
+# Valores de cada sesión que se acumulan en los resúmenes
+CAMPOS = ('puntuacion', 'contacto_pct', 'gestos_seg', 'movimiento', 'postura',
+          'izquierda_pct', 'centro_pct', 'derecha_pct')
+
+PERIODOS = {'dia': 'resumen_diario', 'semana': 'resumen_semanal'}
+
+_columnas = ", ".join(f"{campo} REAL NOT NULL" for campo in CAMPOS)
+_sumas = ", ".join(f"suma_{campo} REAL NOT NULL" for campo in CAMPOS)
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS sesiones (
+    id INTEGER PRIMARY KEY,
+    usuario TEXT NOT NULL,
+    inicio REAL NOT NULL,
+    duracion REAL NOT NULL,
+    {_columnas}
+);
+CREATE INDEX IF NOT EXISTS idx_sesiones_usuario_inicio ON sesiones (usuario, inicio);
+
+CREATE TABLE IF NOT EXISTS resumen_diario (
+    usuario TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    sesiones INTEGER NOT NULL,
+    segundos REAL NOT NULL,
+    {_sumas},
+    PRIMARY KEY (usuario, periodo)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS resumen_semanal (
+    usuario TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    sesiones INTEGER NOT NULL,
+    segundos REAL NOT NULL,
+    {_sumas},
+    PRIMARY KEY (usuario, periodo)
+) WITHOUT ROWID;
+"""
+
+
+def _dia(inicio):
+    return date.fromtimestamp(inicio).isoformat()
+
+
+def _semana(inicio):
+    anio, semana, _ = date.fromtimestamp(inicio).isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+
+class HistorialSesiones:
+    """Almacén del historial con una conexión SQLite por hilo.
+
+    La base de datos se abre (y se crea su esquema) con el primer uso, no al
+    construir el objeto.
+    """
+
+    def __init__(self, ruta=RUTA_HISTORIAL):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._esquema_creado = False
+        self._lock_esquema = threading.Lock()
+
+    def _conexion(self):
+        con = getattr(self._local, "conexion", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=10)
+            con.row_factory = sqlite3.Row
+            # WAL: las lecturas del endpoint no esperan a las escrituras
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = con
+            with self._lock_esquema:
+                if not self._esquema_creado:
+                    with con:
+                        con.executescript(ESQUEMA)
+                    self._esquema_creado = True
+        return con
+
+    def registrar(self, usuario, duracion, resumen, inicio=None):
+        """Guarda una sesión y actualiza sus acumulados diario y semanal. Devuelve su id."""
+        inicio = time.time() if inicio is None else inicio
+        valores = [float(resumen[campo]) for campo in CAMPOS]
+        con = self._conexion()
+        with con:
+            cursor = con.execute(
+                f"INSERT INTO sesiones (usuario, inicio, duracion, {', '.join(CAMPOS)}) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(CAMPOS))})",
+                [usuario, inicio, duracion, *valores],
+            )
+            for tabla, periodo in (('resumen_diario', _dia(inicio)), ('resumen_semanal', _semana(inicio))):
+                con.execute(
+                    f"INSERT INTO {tabla} (usuario, periodo, sesiones, segundos, "
+                    f"{', '.join('suma_' + c for c in CAMPOS)}) "
+                    f"VALUES (?, ?, 1, ?, {', '.join('?' * len(CAMPOS))}) "
+                    f"ON CONFLICT (usuario, periodo) DO UPDATE SET "
+                    f"sesiones = sesiones + 1, segundos = segundos + excluded.segundos, "
+                    + ", ".join(f"suma_{c} = suma_{c} + excluded.suma_{c}" for c in CAMPOS),
+                    [usuario, periodo, duracion, *valores],
+                )
+        return cursor.lastrowid
+
+    def tendencia(self, usuario, periodo='dia', limite=90):
+        """Medias por día o semana (las ``limite`` más recientes, en orden cronológico)."""
+        if periodo not in PERIODOS:
+            raise ValueError(f"Periodo desconocido: {periodo} (opciones: {', '.join(PERIODOS)})")
+        medias = ", ".join(f"suma_{c} / sesiones AS {c}" for c in CAMPOS)
+        filas = self._conexion().execute(
+            f"SELECT periodo, sesiones, segundos, {medias} FROM {PERIODOS[periodo]} "
+            f"WHERE usuario = ? ORDER BY periodo DESC LIMIT ?",
+            (usuario, limite),
+        ).fetchall()
+        return [dict(fila) for fila in reversed(filas)]
+
+    def sesiones(self, usuario, limite=50):
+        """Últimas ``limite`` sesiones del usuario, de la más reciente a la más antigua."""
+        filas = self._conexion().execute(
+            "SELECT * FROM sesiones WHERE usuario = ? ORDER BY inicio DESC LIMIT ?",
+            (usuario, limite),
+        ).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def totales(self, usuario):
+        """Número de sesiones y horas acumuladas del usuario."""
+        fila = self._conexion().execute(
+            "SELECT COALESCE(SUM(sesiones), 0) AS sesiones, COALESCE(SUM(segundos), 0) AS segundos "
+            "FROM resumen_semanal WHERE usuario = ?",
+            (usuario,),
+        ).fetchone()
+        return {"sesiones": fila["sesiones"], "horas": fila["segundos"] / 3600}
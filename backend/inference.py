@@ -0,0 +1,204 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backends import ajustar_hilos_modelo, configurar_hilos, preparar_modelo
+
+# Tamaño del pool de inferencia y de la cola de trabajos pendientes.
+# Se pueden ajustar con variables de entorno sin tocar el código.
+INFERENCE_WORKERS = int(os.environ.get("ORATOR_INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+INFERENCE_QUEUE = int(os.environ.get("ORATOR_INFERENCE_QUEUE", INFERENCE_WORKERS * 2))
+
+# Micro-batching de YOLO: máximo de frames por lote y espera máxima (ms)
+# para completarlo. Con BATCH_MAX=1 o BATCH_WAIT_MS=0 cada frame va solo.
+BATCH_MAX = int(os.environ.get("ORATOR_BATCH_MAX", 8))
+BATCH_WAIT_MS = float(os.environ.get("ORATOR_BATCH_WAIT_MS", 5))
+
+MODELO_YOLO = "yolov8n.pt"
+
+# Motor de análisis: "deteccion" (YOLO + FaceMesh) o "pose" (un único modelo
+# YOLOv8-pose que da la caja, la orientación de la cabeza y las muñecas).
+MOTOR = os.environ.get("ORATOR_MOTOR", "deteccion")
+MODELO_POSE = os.environ.get("ORATOR_POSE_MODEL", "yolov8n-pose.pt")
+
+# Backend de inferencia en CPU: "pytorch", "onnx" (ONNX Runtime) u "openvino",
+# con variante INT8 opcional. Los hilos por modelo se reparten por defecto
+# entre los workers del pool para no sobresuscribir la CPU.
+BACKEND = os.environ.get("ORATOR_BACKEND", "pytorch")
+BACKEND_INT8 = os.environ.get("ORATOR_INT8", "0") == "1"
+BACKEND_THREADS = int(os.environ.get("ORATOR_BACKEND_THREADS", 0)) or max(1, (os.cpu_count() or 1) // INFERENCE_WORKERS)
+
+
+def configurar_backend(backend=None, int8=None, hilos=None):
+    """Cambia el backend en tiempo de ejecución (lo usa la comparación de backends).
+
+    Los modelos ya cargados no cambian: solo afecta a los que se creen después.
+    """
+    global BACKEND, BACKEND_INT8, BACKEND_THREADS
+    if backend is not None:
+        BACKEND = backend
+    if int8 is not None:
+        BACKEND_INT8 = int8
+    if hilos is not None:
+        BACKEND_THREADS = hilos
+
+
+def ruta_modelo():
+    """Modelo que carga cada hilo según el motor y el backend elegidos al arrancar."""
+    checkpoint = MODELO_POSE if MOTOR == "pose" else MODELO_YOLO
+    return preparar_modelo(checkpoint, BACKEND, BACKEND_INT8)
+
+# Cada hilo del pool usa su propia instancia del modelo: el predictor de
+# ultralytics guarda estado interno y no es seguro compartirlo entre hilos.
+_local = threading.local()
+
+# Los hilos de PyTorch/OpenCV son de todo el proceso: se fijan con el primer modelo
+_hilos_configurados = False
+_lock_hilos = threading.Lock()
+
+
+def _configurar_hilos_una_vez():
+    global _hilos_configurados
+    with _lock_hilos:
+        if not _hilos_configurados:
+            configurar_hilos(BACKEND_THREADS)
+            _hilos_configurados = True
+
+
+def obtener_modelo():
+    """Devuelve el modelo YOLO del hilo actual, creándolo la primera vez."""
+    modelo = getattr(_local, "modelo", None)
+    if modelo is None:
+        # ultralytics (y con él PyTorch) se importa al cargar el primer modelo
+        _configurar_hilos_una_vez()
+        from ultralytics import YOLO
+
+        ruta = ruta_modelo()
+        modelo = YOLO(ruta)
+        if BACKEND != "pytorch":
+            # El primer predict crea la sesión de ONNX Runtime / OpenVINO;
+            # luego se recrea con el número de hilos configurado.
+            modelo.predict(source=np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+            ajustar_hilos_modelo(modelo, ruta, BACKEND_THREADS)
+        _local.modelo = modelo
+    return modelo
+
+
+def descartar_modelo():
+    """Olvida el modelo del hilo actual (el siguiente obtener_modelo lo recarga)."""
+    _local.__dict__.pop("modelo", None)
+
+
+class InferenceExecutor:
+    """Ejecuta el trabajo de CPU (YOLO, FaceMesh, codificación JPEG) fuera del event loop.
+
+    Los handlers de Socket.IO hacen ``await executor.ejecutar(fn, *args)``; el
+    trabajo corre en un pool de hilos y, mientras tanto, el event loop sigue
+    atendiendo pings, eventos de otros clientes y ``stop_analysis``. Un semáforo
+    limita los trabajos en vuelo para que la cola no crezca sin control.
+    """
+
+    def __init__(self, workers=None, max_pendientes=None):
+        self.workers = workers or INFERENCE_WORKERS
+        self.max_pendientes = max_pendientes or max(INFERENCE_QUEUE, self.workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inferencia")
+        self._cupos = asyncio.Semaphore(self.max_pendientes)
+
+    async def ejecutar(self, fn, *args, **kwargs):
+        async with self._cupos:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    async def en_cada_hilo(self, fn):
+        """Ejecuta ``fn`` una vez en cada hilo del pool (p. ej. para precalentar modelos).
+
+        Una barrera retiene cada tarea hasta que todas están en marcha, lo que
+        obliga a repartirlas en hilos distintos.
+        """
+        partes = min(self.workers, self.max_pendientes)
+        barrera = threading.Barrier(partes)
+
+        def tarea():
+            barrera.wait(timeout=60)
+            return fn()
+
+        return await asyncio.gather(*(self.ejecutar(tarea) for _ in range(partes)))
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _predecir_lote(frames, conf):
+    return obtener_modelo().predict(source=frames, conf=conf, verbose=False)
+
+
+class BatchScheduler:
+    """Agrupa los frames de todas las sesiones en un único ``predict`` de YOLO.
+
+    Cada llamada a ``predecir(frame)`` encola el frame y espera su resultado.
+    Un recolector junta hasta ``max_batch`` frames durante como mucho
+    ``max_espera_ms``, lanza un predict por lotes en el ``InferenceExecutor`` y
+    reparte cada ``Results`` a la sesión que lo pidió. En CPU un lote de N
+    imágenes rinde bastante más por núcleo que N llamadas sueltas.
+    """
+
+    def __init__(self, executor, max_batch=None, max_espera_ms=None, conf=0.4):
+        self.executor = executor
+        self.max_batch = max(1, max_batch or BATCH_MAX)
+        self.max_espera = (BATCH_WAIT_MS if max_espera_ms is None else max_espera_ms) / 1000.0
+        self.conf = conf
+        self._cola = None
+        self._recolector = None
+        self._lotes = set()
+
+    async def predecir(self, frame):
+        """Devuelve el ``Results`` de YOLO para ``frame``."""
+        if self._recolector is None or self._recolector.done():
+            self._cola = asyncio.Queue()
+            self._recolector = asyncio.create_task(self._recolectar())
+        futuro = asyncio.get_running_loop().create_future()
+        await self._cola.put((frame, futuro))
+        return await futuro
+
+    async def _recolectar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._cola.get()]
+            limite = loop.time() + self.max_espera
+            while len(lote) < self.max_batch:
+                if not self._cola.empty():
+                    lote.append(self._cola.get_nowait())
+                    continue
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            # El lote corre en el pool mientras se recolecta el siguiente
+            tarea = asyncio.create_task(self._ejecutar_lote(lote))
+            self._lotes.add(tarea)
+            tarea.add_done_callback(self._lotes.discard)
+
+    async def _ejecutar_lote(self, lote):
+        frames = [frame for frame, _ in lote]
+        try:
+            resultados = await self.executor.ejecutar(_predecir_lote, frames, self.conf)
+        except Exception as e:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+        for (_, futuro), resultado in zip(lote, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+    def cerrar(self):
+        if self._recolector is not None:
+            self._recolector.cancel()
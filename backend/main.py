@@ -1,51 +1,183 @@
 import asyncio
 import base64
 import cv2
+import os
 import time
-import json
-from datetime import datetime
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Form
+from fastapi import FastAPI
+from fastapi.responses import FileResponse, JSONResponse
 import socketio
-from ultralytics import YOLO
-from PIL import Image as PILImage, ImageTk
 import numpy as np
 
-from camera import ThreadedCamera
-from analysis import (
-    analyze_posture,
-    analyze_expression,
-    analyze_space_usage,
-    calculate_fluency,
-    reset_metrics,
-    analyze_eye_contact,
+from camera_process import CAPTURA, crear_camara
+from history import PERIODOS, HistorialSesiones
+from inference import BatchScheduler, InferenceExecutor
+from pipeline import (
+    dibujar_detecciones,
+    precalentar,
+    seguir,
+    superposicion,
+    tras_deteccion,
 )
-from reporting import generar_reporte_avanzado
-
-# Configuración de la aplicación FastAPI y Socket.IO
-app = FastAPI()
+from recording import GrabadorSesion, metricas_sesion
+from report_queue import ReportQueue
+from reporting import DPI_GRAFICOS, resumen_metricas
+from sessions import SessionManager, normalizar_config
+
+# Estado del arranque: los modelos se cargan y precalientan en segundo plano
+# después de que uvicorn empiece a aceptar conexiones.
+arranque = {"inicio": time.time(), "listo": False, "error": None, "segundos_precalentado": None}
+
+@asynccontextmanager
+async def lifespan(_api):
+    tarea = asyncio.create_task(_precalentar_modelos())
+    yield
+    tarea.cancel()
+    detector.cerrar()
+    inferencia.cerrar()
+    reportes.cerrar()
+
+# Configuración de la aplicación FastAPI y Socket.IO. Socket.IO atiende su
+# ruta (/socket.io) y delega el resto de peticiones HTTP en FastAPI.
+api = FastAPI(lifespan=lifespan)
 sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
-socket_app = socketio.ASGIApp(sio)
-app.mount("/", socket_app)
+app = socketio.ASGIApp(sio, other_asgi_app=api)
 
-# Estado global (simplificado, para producción se recomienda una mejor gestión)
-analizando = False
-# Soporta ahora dos modos:
+# Sesiones activas indexadas por sid. Soporta dos modos:
 #   • "local" / "ip"  → se usa ThreadedCamera y run_analysis_loop()
 #   • "browser"        → el cliente envía cada fotograma con el evento "browser_frame"
-#     y se procesan aquí manteniendo el estado en browser_session.
-
-modelo = YOLO("yolov8n.pt")
-
-# Estructura para mantener el estado de la sesión cuando la cámara proviene del navegador
-browser_session = {
-    "metricas": None,
-    "inicio": None,
-    "duracion": None,
-    "prev_centro": None,
-    "config": None,
-    "sid": None,
-}
+#     y se procesan aquí manteniendo el estado en su AnalysisSession.
+sesiones = SessionManager()
+
+# Pool donde corre la inferencia para no bloquear el event loop de Socket.IO
+inferencia = InferenceExecutor()
+# YOLO se ejecuta por lotes con los frames de todas las sesiones activas
+detector = BatchScheduler(inferencia, conf=0.4)
+# Los PDF se generan en procesos aparte; el progreso llega por Socket.IO
+reportes = ReportQueue(lambda evento, datos, sid: sio.emit(evento, datos, room=sid))
+# Historial de sesiones completadas por usuario (SQLite)
+historial = HistorialSesiones()
+
+async def _detectar(sesion, frame):
+    """Detecciones del frame y contacto visual sobre la persona.
+
+    Según la cadencia de la sesión se ejecuta YOLO (por lotes) o solo se sigue
+    la caja de la persona; si el seguimiento se pierde se detecta en el acto.
+    Mismas etapas que ``FrameAnalyzer.procesar`` (``seguir`` / ``tras_deteccion``)
+    pero con el pool de inferencia y el micro-batching.
+    """
+    cadencia = sesion.analizador.cadencia
+    if not cadencia.debe_detectar():
+        inferido = await inferencia.ejecutar(seguir, cadencia, frame)
+        if inferido is not None:
+            return inferido
+    resultado = await detector.predecir(frame)
+    return await inferencia.ejecutar(tras_deteccion, cadencia, frame, resultado)
+
+def _metricas_en_vivo(sesion, tiempo_actual):
+    """Métricas en vivo de la sesión más el ritmo de frames conseguido."""
+    metricas = sesion.analizador.metricas_en_vivo(tiempo_actual, sesion.duracion)
+    metricas.update(sesion.ritmo.estado())
+    return metricas
+
+async def _emitir_vista_previa(sesion, frame, detecciones):
+    """Anota, codifica y envía el frame según el nivel de degradación del ritmo."""
+    enviar, anotar, escala = sesion.ritmo.vista_previa()
+    if not enviar:
+        return
+    # El frame es de esta iteración (buffer prestado o recién decodificado): se anota sin copiarlo
+    imagen = await inferencia.ejecutar(
+        _anotar_y_codificar, frame, detecciones, sesion.binario, True, anotar, escala
+    )
+    await sio.emit('video_frame', {'image': imagen}, room=sesion.sid)
+
+async def _analizar_frame(sesion, frame, tiempo_actual):
+    """Inferencia asíncrona + pipeline compartido de la sesión. Devuelve las detecciones."""
+    eye_contact, detecciones, pose = await _detectar(sesion, frame)
+    sesion.analizador.analizar(frame, tiempo_actual, eye_contact, detecciones, pose)
+    return detecciones
+
+def _anotar_y_codificar(frame, detecciones, binario=False, en_sitio=False, anotar=True, escala=1.0):
+    """Dibuja las detecciones y codifica el frame en JPEG.
+
+    Con ``binario`` devuelve los bytes JPEG tal cual (se envían como adjunto
+    binario de Socket.IO); si no, el JPEG en base64 para clientes antiguos.
+    Con ``en_sitio`` dibuja sobre el propio ``frame`` en lugar de una copia.
+    ``anotar=False`` y ``escala < 1`` abaratan la vista previa cuando el
+    ritmo de frames va justo (ver ``FramePacer.vista_previa``).
+    """
+    frame_anotado = dibujar_detecciones(frame, detecciones, en_sitio) if anotar else frame
+    if escala < 1.0:
+        frame_anotado = cv2.resize(frame_anotado, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode('.jpg', frame_anotado)
+    if binario:
+        return buffer.tobytes()
+    return base64.b64encode(buffer.tobytes()).decode('utf-8')
+
+def _decodificar_jpeg(image):
+    """Decodifica un JPEG recibido como bytes (modo binario) o como texto base64."""
+    if isinstance(image, str):
+        image = base64.b64decode(image)
+    np_arr = np.frombuffer(image, np.uint8)
+    if np_arr.size == 0:
+        return None
+    return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+
+async def _precalentar_modelos():
+    """Carga los modelos y ejecuta una inferencia de prueba en cada hilo del pool."""
+    try:
+        await inferencia.en_cada_hilo(precalentar)
+        arranque["segundos_precalentado"] = round(time.time() - arranque["inicio"], 2)
+        arranque["listo"] = True
+        print(f"🔥 Modelos listos en {arranque['segundos_precalentado']} s")
+    except Exception as e:
+        arranque["error"] = str(e)
+        print(f"❌ Error al precalentar los modelos: {e}")
+
+@api.get("/health")
+async def health():
+    """Liveness: el proceso responde."""
+    return {"status": "ok"}
+
+@api.get("/ready")
+async def ready():
+    """Readiness: 200 cuando los modelos están cargados y precalentados, 503 mientras tanto."""
+    cuerpo = {
+        "listo": arranque["listo"],
+        "error": arranque["error"],
+        "segundos_precalentado": arranque["segundos_precalentado"],
+        "sesiones_activas": len(sesiones),
+    }
+    return JSONResponse(cuerpo, status_code=200 if arranque["listo"] else 503)
+
+@api.get("/reports/{job_id}")
+async def descargar_reporte(job_id: str):
+    """Descarga el PDF de un trabajo terminado (o su estado si aún no está listo)."""
+    trabajo = reportes.obtener(job_id)
+    if trabajo is None:
+        return JSONResponse({"error": "Reporte no encontrado"}, status_code=404)
+    if trabajo.estado != "listo":
+        return JSONResponse(trabajo.to_dict(), status_code=500 if trabajo.estado == "error" else 202)
+    if not os.path.exists(trabajo.archivo):
+        # Eliminado por la política de retención de reportes/
+        return JSONResponse({"error": "El reporte ya no está disponible"}, status_code=410)
+    return FileResponse(trabajo.archivo, media_type="application/pdf", filename=os.path.basename(trabajo.archivo))
+
+@api.get("/history/{usuario}")
+def historial_usuario(usuario: str, periodo: str = "dia", limite: int = 90):
+    """Tendencia del usuario por día o semana, o sus últimas sesiones con ``periodo=sesion``.
+
+    Es síncrono a propósito: FastAPI lo ejecuta en su pool de hilos y la
+    consulta a SQLite no bloquea el event loop.
+    """
+    if periodo == "sesion":
+        puntos = historial.sesiones(usuario, limite)
+    elif periodo in PERIODOS:
+        puntos = historial.tendencia(usuario, periodo, limite)
+    else:
+        return JSONResponse({"error": f"Periodo desconocido: {periodo}"}, status_code=400)
+    return {"usuario": usuario, "periodo": periodo, "totales": historial.totales(usuario), "puntos": puntos}
 
 @sio.on("connect")
 async def connect(sid, environ):
@@ -54,359 +186,251 @@ async def connect(sid, environ):
 @sio.on("disconnect")
 async def disconnect(sid):
     print(f"Socket.IO client disconnected: {sid}")
-    global analizando
-    analizando = False
+    # Se descarta la sesión; un reporte ya encolado sigue disponible por HTTP
+    sesiones.cerrar(sid)
 
 @sio.on("start_analysis")
 async def start_analysis(sid, config):
+    # Los valores numéricos del cliente se acotan antes de usarlos (DPI del reporte, fps...)
+    config = normalizar_config(config)
     print(f"Iniciando análisis con configuración: {config}")
-    global analizando
-    if analizando:
-        print("El análisis ya está en curso.")
-        return
-
-    analizando = True
-
-    # Si la cámara viene del navegador, se inicializa la sesión y se espera a los frames
-    if config.get("camera_type") == "browser":
-        browser_session["metricas"] = reset_metrics()
-        browser_session["inicio"] = time.time()
-        browser_session["duracion"] = config.get("duracion", 30)
-        browser_session["prev_centro"] = None
-        browser_session["config"] = config
-        browser_session["sid"] = sid
+    if sesiones.en_curso(sid):
+        print(f"El análisis ya está en curso para {sid}.")
+        return {"ok": False, "error": "El análisis ya está en curso."}
+    # Retención y apertura de la grabación tocan el disco: fuera del event loop
+    grabador = await asyncio.to_thread(GrabadorSesion.para_sesion, sid, config)
+    sesion = sesiones.crear(sid, config, grabador)
+    if sesion is None:
+        # Otro start_analysis del mismo cliente se adelantó mientras se abría
+        if grabador is not None:
+            await asyncio.to_thread(grabador.cerrar)
+        print(f"El análisis ya está en curso para {sid}.")
+        return {"ok": False, "error": "El análisis ya está en curso."}
+
+    # Si la cámara viene del navegador, la sesión queda esperando los frames
+    if sesion.modo == "browser":
         await sio.emit("status_update", {"message": "Enviando vídeo desde navegador..."}, room=sid)
     else:
-        # Para cámara local o IP se mantiene la lógica existente
-        asyncio.create_task(run_analysis_loop(sid, config))
+        # Para cámara local o IP se lanza un bucle propio para esta sesión
+        sesion.tarea = asyncio.create_task(run_analysis_loop(sesion))
+
+    # Respuesta (ack) con el transporte de frames y la superposición acordados
+    return {"ok": True, "transporte": sesion.transporte, "overlay": sesion.overlay}
 
 @sio.on("stop_analysis")
 async def stop_analysis(sid):
-    global analizando
-    print("Deteniendo análisis...")
-    analizando = False
+    print(f"Deteniendo análisis de {sid}...")
+    sesion = sesiones.obtener(sid)
+    if sesion is None:
+        return
+    sesion.detener()
 
-    # Si la sesión es de navegador limpiamos y notificamos
-    if browser_session.get("sid") == sid:
-        await finalize_browser_session()
+    # Si la sesión es de navegador generamos el reporte y notificamos
+    if sesion.modo == "browser":
+        await finalize_browser_session(sesion)
+
+async def run_analysis_loop(sesion):
+    sid = sesion.sid
+    config = sesion.config
+    cam = None
 
-async def run_analysis_loop(sid, config):
-    global analizando, modelo
-    
     try:
         await sio.emit('status_update', {'message': 'Iniciando cámara...'}, room=sid)
         src = 0 if config.get("camera_type") == "local" else f"http://{config.get('ip')}/video"
-        cam = ThreadedCamera(src).start()
+        # Abrir la cámara (o lanzar su proceso de captura) puede tardar segundos
+        cam = await asyncio.to_thread(crear_camara, src, config.get("captura", CAPTURA))
         if cam is None:
             await sio.emit("analysis_error", {"error": "No se pudo conectar a la cámara."}, room=sid)
-            analizando = False
             return
 
-        ancho, alto = 640, 480
+        # La duración cuenta desde que la cámara entrega vídeo, no desde que se
+        # pidió la sesión (abrir un stream IP o el proceso de captura tarda)
+        sesion.inicio = time.time()
+
         # salida = None # Implementar guardado de video si es necesario
 
-        inicio = time.time()
-        duracion = config.get('duracion', 30)
-        metricas = reset_metrics()
-        prev_centro_persona = None
-        
-        zona_contacto_x_min = ancho * 0.3
-        zona_contacto_x_max = ancho * 0.7
+        inicio = sesion.inicio
+        duracion = sesion.duracion
 
         print(f"🎬 Iniciando bucle de análisis de {duracion} segundos...")
 
-        while analizando and (time.time() - inicio) < duracion:
-            frame = cam.read()
-            if frame is None:
-                await asyncio.sleep(0.01)
+        while sesion.activa and (time.time() - inicio) < duracion:
+            # Cada frame capturado se analiza una sola vez: se espera al siguiente
+            captura = await cam.read_next(timeout=1.0)
+            if captura is None:
+                if cam.stopped:
+                    # La captura terminó por su cuenta (p. ej. murió su proceso):
+                    # read_next ya no espera y el bucle acapararía el event loop
+                    raise RuntimeError("Se perdió la conexión con la cámara.")
                 continue
-
-            metricas['frames_totales'] += 1
-            tiempo_actual = time.time() - inicio
-
-            # --- Detección de contacto visual (MediaPipe) ---
-            contact_already = False
-            eye_contact = analyze_eye_contact(frame)
-            if eye_contact is True:
-                metricas['frames_contacto'] += 1
-                contact_already = True
-
-            resultados = modelo.predict(source=frame, conf=0.4, verbose=False)
-            frame_anotado = frame.copy()
-            bbox_persona = None  # Se inicializa para evitar referencia no definida
-
-            if len(resultados) > 0 and resultados[0].boxes is not None:
-                frame_anotado = resultados[0].plot()
-                objetos = resultados[0].boxes.cls.tolist()
-                nombres = [resultados[0].names[int(cls)] for cls in objetos]
-                cajas = resultados[0].boxes.xyxy.cpu().numpy()
-
-                contacto = False
-                gestos = 0
-                area_mayor = 0
-
-                for i, nombre in enumerate(nombres):
-                    x1, y1, x2, y2 = cajas[i]
-                    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
-                    area = (x2 - x1) * (y2 - y1)
-                    
-                    if nombre == "person":
-                        if area > area_mayor:
-                            bbox_persona = (x1, y1, x2, y2, cx, cy)
-                            area_mayor = area
-                        if zona_contacto_x_min < cx < zona_contacto_x_max:
-                            if not contact_already:
-                                metricas['frames_contacto'] += 1
-                                contact_already = True
-                        if prev_centro_persona:
-                            dist = ((cx - prev_centro_persona[0])**2 + (cy - prev_centro_persona[1])**2)**0.5
-                            metricas['distancias_mov'].append(dist)
-                        prev_centro_persona = (cx, cy)
-                        zona = analyze_space_usage(cx, ancho)
-                        metricas['uso_espacio'][zona] += 1
-                    elif nombre in ["hand", "face"]:
-                        gestos += 1
-                
-                metricas['gestos_totales'] += gestos
-                metricas['gestos_por_tiempo'].append((tiempo_actual, gestos))
-
-                if bbox_persona is not None:
-                    postura = analyze_posture(bbox_persona)
-                    metricas['postura_evaluacion'].append(postura)
-                    metricas['postura_por_tiempo'].append((tiempo_actual, postura))
-
-            # Expresiones faciales solo en modo avanzado para ahorrar recursos
-            if config.get('analisis_avanzado') and bbox_persona:
-                expresion = analyze_expression(frame, bbox_persona)
-                metricas['expresiones_faciales'][expresion] += 1
-
-            # Calcular y emitir métricas en tiempo real, convirtiendo tipos de NumPy a nativos de Python
-            contacto_pct = (metricas['frames_contacto'] / metricas['frames_totales']) * 100 if metricas['frames_totales'] > 0 else 0
-            # Ventana deslizante de 3 segundos para gestos y postura
-            VENTANA = 3.0
-            gestos_ventana = [g for t, g in metricas['gestos_por_tiempo'] if tiempo_actual - t <= VENTANA]
-            gestos_seg = sum(gestos_ventana) / VENTANA if gestos_ventana else 0
-            mov_prom = float(np.mean(metricas['distancias_mov'])) if metricas['distancias_mov'] else 0.0
-            posturas_ventana = [p for t, p in metricas['postura_por_tiempo'] if tiempo_actual - t <= VENTANA]
-            postura_prom = float(np.mean(posturas_ventana)) if posturas_ventana else 5.0
-            expresividad = min(10, gestos_seg * 3 + 3)
-            fluidez = float(calculate_fluency(metricas))
-
-            live_metrics = {
-                'contacto': contacto_pct,
-                'gestos': gestos_seg,
-                'movimiento': mov_prom,
-                'postura': postura_prom,
-                'expresividad': expresividad,
-                'fluidez': fluidez,
-                'progreso': (tiempo_actual / duracion) * 100,
-                'tiempo_actual': tiempo_actual,
-            }
-            await sio.emit('live_metrics', live_metrics, room=sid)
-
-            # Codificar y emitir frame de video
-            _, buffer = cv2.imencode('.jpg', frame_anotado)
-            frame_b64 = base64.b64encode(buffer.tobytes()).decode('utf-8')
-            await sio.emit('video_frame', {'image': frame_b64}, room=sid)
-
-            await asyncio.sleep(0.05) # Controla el FPS del stream
+            _, capturado, frame = captura
+
+            sesion.ritmo.inicio()
+            # El frame es un buffer prestado del anillo de la cámara: tras
+            # analizarlo se anota sobre él mismo y se devuelve.
+            try:
+                # Tiempo de captura, no el de fin de la inferencia anterior
+                tiempo_actual = max(0.0, capturado - inicio)
+                detecciones = await _analizar_frame(sesion, frame, tiempo_actual)
+                # Emitir métricas en tiempo real y el frame de video anotado
+                await sio.emit('live_metrics', _metricas_en_vivo(sesion, tiempo_actual), room=sid)
+                await _emitir_vista_previa(sesion, frame, detecciones)
+            finally:
+                cam.release(frame)
+
+            # Solo se espera lo que sobra del presupuesto del frame
+            espera = sesion.ritmo.fin()
+            if espera > 0:
+                await asyncio.sleep(espera)
 
         print("📊 Finalizando análisis...")
         cam.stop()
+        print(f"📷 {cam.seq} frames capturados, {cam.descartados} descartados, {cam.duplicados} duplicados")
         
-        if analizando: # Si no fue detenido manualmente
-            print("📄 Generando reporte...")
-            report_config = {
-                'analisis_avanzado': config.get('analisis_avanzado', True)
-            }
-            pdf_file = generar_reporte_avanzado(
-                nombre_usuario=config.get('nombre', 'Usuario'),
-                duracion=duracion,
-                metricas=metricas,
-                config=report_config
-            )
-            await sio.emit("report_generated", {"file_path": pdf_file}, room=sid)
+        if sesion.activa: # Si no fue detenido manualmente
+            print("📄 Encolando reporte...")
+            await _encolar_reporte(sesion)
+            await _guardar_historial(sesion)
         
     except Exception as e:
         print(f"❌ Error en run_analysis_loop: {str(e)}")
         await sio.emit("analysis_error", {"error": str(e)}, room=sid)
     finally:
-        analizando = False
+        if cam is not None:
+            cam.stop()
+        sesiones.cerrar(sid, sesion)
         print("Análisis finalizado.")
         await sio.emit("analysis_finished", room=sid)
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
-
 # -----------------------------------------------
 # NUEVO: Manejo de frames enviados desde el navegador
 # -----------------------------------------------
 
 @sio.on("browser_frame")
 async def browser_frame(sid, data):
-    """Recibe fotogramas base64 desde el navegador del cliente."""
-    global analizando, browser_session, modelo
+    """Recibe fotogramas JPEG (binarios o base64) desde el navegador del cliente."""
+    sesion = sesiones.obtener(sid)
+
+    # Ignorar si el cliente no tiene una sesión de navegador activa
+    if sesion is None or not sesion.activa or sesion.modo != "browser":
+        return
 
-    # Ignorar si no estamos en modo análisis o el sid no coincide
-    if not analizando or browser_session.get("sid") != sid:
+    # Backpressure: solo se conserva el frame más reciente. Si ya hay un
+    # consumidor para esta sesión, él recogerá este frame al terminar el actual.
+    if not sesion.ingesta.depositar(data):
         return
 
+    while True:
+        data = sesion.ingesta.tomar()
+        if data is None:
+            break
+        if not sesion.activa:
+            continue
+        await _procesar_browser_frame(sesion, data)
+        # Crédito para el cliente: todos los frames con seq <= este ya se
+        # consumieron (analizados o descartados) y puede enviar más.
+        await sio.emit("frame_ack", {
+            "seq": data.get("seq"),
+            "descartados": sesion.ingesta.descartados,
+        }, room=sid)
+
+async def _procesar_browser_frame(sesion, data):
+    """Analiza un fotograma del navegador y emite métricas y frame anotado."""
+    sid = sesion.sid
     try:
         # Decodificar la imagen
-        img_bytes = base64.b64decode(data.get("image", ""))
-        np_arr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        frame = await inferencia.ejecutar(_decodificar_jpeg, data.get("image", ""))
         if frame is None:
             return
 
-        ancho, alto = frame.shape[1], frame.shape[0]
-
-        # Iniciales de la sesión
-        metricas = browser_session["metricas"]
-        prev_centro_persona = browser_session["prev_centro"]
-
-        duracion = browser_session["duracion"]
-        tiempo_actual = time.time() - browser_session["inicio"]
-
-        # --------------------------------------------------
-        # Lógica de análisis (idéntica a la de run_analysis_loop)
-        # --------------------------------------------------
-        metricas["frames_totales"] += 1
-
-        # --- Detección de contacto visual (MediaPipe) ---
-        contact_already = False
-        eye_contact = analyze_eye_contact(frame)
-        if eye_contact is True:
-            metricas["frames_contacto"] += 1
-            contact_already = True
-
-        resultados = modelo.predict(source=frame, conf=0.4, verbose=False)
-        frame_anotado = frame.copy()
-        bbox_persona = None  # Se inicializa para evitar referencia no definida
-
-        zona_contacto_x_min = ancho * 0.3
-        zona_contacto_x_max = ancho * 0.7
-
-        if len(resultados) > 0 and resultados[0].boxes is not None:
-            frame_anotado = resultados[0].plot()
-            objetos = resultados[0].boxes.cls.tolist()
-            nombres = [resultados[0].names[int(cls)] for cls in objetos]
-            cajas = resultados[0].boxes.xyxy.cpu().numpy()
-
-            gestos = 0
-            area_mayor = 0
-
-            for i, nombre in enumerate(nombres):
-                x1, y1, x2, y2 = cajas[i]
-                cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
-                area = (x2 - x1) * (y2 - y1)
-
-                if nombre == "person":
-                    if area > area_mayor:
-                        bbox_persona = (x1, y1, x2, y2, cx, cy)
-                        area_mayor = area
-                    if zona_contacto_x_min < cx < zona_contacto_x_max:
-                        if not contact_already:
-                            metricas["frames_contacto"] += 1
-                            contact_already = True
-                    if prev_centro_persona:
-                        dist = ((cx - prev_centro_persona[0])**2 + (cy - prev_centro_persona[1])**2)**0.5
-                        metricas["distancias_mov"].append(dist)
-                    prev_centro_persona = (cx, cy)
-                    zona = analyze_space_usage(cx, ancho)
-                    metricas["uso_espacio"][zona] += 1
-                elif nombre in ["hand", "face"]:
-                    gestos += 1
-
-            metricas["gestos_totales"] += gestos
-            metricas["gestos_por_tiempo"].append((tiempo_actual, gestos))
-
-            if bbox_persona is not None:
-                postura = analyze_posture(bbox_persona)
-                metricas["postura_evaluacion"].append(postura)
-                metricas["postura_por_tiempo"].append((tiempo_actual, postura))
-
-            # Expresiones faciales solo en modo avanzado para ahorrar recursos
-            if browser_session["config"].get("analisis_avanzado") and bbox_persona:
-                expresion = analyze_expression(frame, bbox_persona)
-                metricas["expresiones_faciales"][expresion] += 1
-
-        # Calcular métricas en tiempo real
-        contacto_pct = (
-            metricas["frames_contacto"] / metricas["frames_totales"] * 100
-            if metricas["frames_totales"] > 0 else 0
-        )
-        # Ventana deslizante de 3 segundos para gestos y postura
-        VENTANA = 3.0
-        gestos_ventana = [g for t, g in metricas["gestos_por_tiempo"] if tiempo_actual - t <= VENTANA]
-        gestos_seg = sum(gestos_ventana) / VENTANA if gestos_ventana else 0
-        mov_prom = float(np.mean(metricas["distancias_mov"])) if metricas["distancias_mov"] else 0.0
-        posturas_ventana = [p for t, p in metricas["postura_por_tiempo"] if tiempo_actual - t <= VENTANA]
-        postura_prom = float(np.mean(posturas_ventana)) if posturas_ventana else 5.0
-        expresividad = min(10, gestos_seg * 3 + 3)
-        fluidez = float(calculate_fluency(metricas))
-
-        live_metrics = {
-            "contacto": contacto_pct,
-            "gestos": gestos_seg,
-            "movimiento": mov_prom,
-            "postura": postura_prom,
-            "expresividad": expresividad,
-            "fluidez": fluidez,
-            "progreso": (tiempo_actual / duracion) * 100,
-            "tiempo_actual": tiempo_actual,
-        }
-        await sio.emit("live_metrics", live_metrics, room=sid)
-
-        # Enviar frame anotado de vuelta al cliente
-        _, buffer = cv2.imencode('.jpg', frame_anotado)
-        frame_b64 = base64.b64encode(buffer.tobytes()).decode('utf-8')
-        await sio.emit('video_frame', {'image': frame_b64}, room=sid)
-
-        # Guardar estado actualizado
-        browser_session["metricas"] = metricas
-        browser_session["prev_centro"] = prev_centro_persona
+        duracion = sesion.duracion
+        tiempo_actual = sesion.tiempo_transcurrido()
+        # El navegador marca el ritmo con sus créditos: aquí solo se mide
+        sesion.ritmo.inicio()
+        detecciones = await _analizar_frame(sesion, frame, tiempo_actual)
+
+        # Emitir métricas en tiempo real y el frame anotado de vuelta al cliente
+        await sio.emit("live_metrics", _metricas_en_vivo(sesion, tiempo_actual), room=sid)
+        if sesion.overlay == "vector":
+            # Solo las cajas (unos cientos de bytes): sin dibujar ni recodificar el JPEG
+            analizador = sesion.analizador
+            datos = superposicion(detecciones, analizador.persona_actual, analizador.contacto_actual, frame.shape)
+            datos["seq"] = data.get("seq")
+            await sio.emit("overlay", datos, room=sid)
+        else:
+            await _emitir_vista_previa(sesion, frame, detecciones)
+        sesion.ritmo.fin()
 
         # ¿Terminó la sesión por tiempo?
         if tiempo_actual >= duracion:
-            await finalize_browser_session()
+            await finalize_browser_session(sesion)
 
     except Exception as e:
         print(f"❌ Error en browser_frame: {e}")
         await sio.emit("analysis_error", {"error": str(e)}, room=sid)
 
-async def finalize_browser_session():
-    """Genera el reporte y notifica fin de análisis para la sesión de navegador."""
-    global analizando, browser_session
-
-    if not browser_session["metricas"]:
+async def _encolar_reporte(sesion):
+    """Encola el PDF de la sesión; report_progress y report_generated llegan después."""
+    config = sesion.config
+    grabador = sesion.grabador
+    if grabador is not None:
+        # Las series por frame están en la grabación: el worker las lee de ahí
+        await asyncio.to_thread(grabador.flush)
+    return await reportes.encolar(
+        sesion.sid,
+        nombre_usuario=config.get("nombre", "Usuario"),
+        duracion=sesion.duracion,
+        metricas=sesion.metricas,
+        config={
+            "analisis_avanzado": config.get("analisis_avanzado", True),
+            "dpi": config.get("dpi_reporte", DPI_GRAFICOS),
+        },
+        grabacion=grabador.ruta if grabador is not None else None,
+    )
+
+def _resumen_sesion(metricas, duracion, grabacion=None):
+    """Resumen para el historial, con las series de la grabación si la hay."""
+    if grabacion is not None:
+        metricas = metricas_sesion(metricas, grabacion)
+    return resumen_metricas(metricas, duracion)
+
+async def _guardar_historial(sesion):
+    """Añade el resumen de la sesión al historial del usuario."""
+    # Tiempo analizado de verdad: una sesión detenida antes de tiempo dura menos
+    duracion = min(sesion.duracion, sesion.tiempo_transcurrido())
+    grabador = sesion.grabador
+    if grabador is not None:
+        await asyncio.to_thread(grabador.flush)
+    resumen = await asyncio.to_thread(
+        _resumen_sesion, sesion.metricas, duracion, grabador.ruta if grabador is not None else None
+    )
+    await asyncio.to_thread(
+        historial.registrar,
+        sesion.config.get("nombre", "Usuario"),
+        duracion,
+        resumen,
+        sesion.inicio,
+    )
+
+async def finalize_browser_session(sesion):
+    """Encola el reporte y notifica fin de análisis para una sesión de navegador."""
+    sid = sesion.sid
+
+    # cerrar() solo devuelve la sesión una vez: evita reportes duplicados si
+    # stop_analysis y el fin por tiempo llegan a la vez.
+    if sesiones.cerrar(sid, sesion) is None:
         return
 
     try:
-        config = browser_session["config"]
-        sid = browser_session["sid"]
-
-        print("📄 Generando reporte (browser)...")
-        pdf_file = generar_reporte_avanzado(
-            nombre_usuario=config.get("nombre", "Usuario"),
-            duracion=browser_session["duracion"],
-            metricas=browser_session["metricas"],
-            config={"analisis_avanzado": config.get("analisis_avanzado", True)},
-        )
-        await sio.emit("report_generated", {"file_path": pdf_file}, room=sid)
+        print("📄 Encolando reporte (browser)...")
+        await _encolar_reporte(sesion)
+        await _guardar_historial(sesion)
     except Exception as e:
-        print(f"❌ Error al generar reporte (browser): {e}")
-        await sio.emit("analysis_error", {"error": str(e)}, room=browser_session["sid"])
+        print(f"❌ Error al encolar reporte (browser): {e}")
+        await sio.emit("analysis_error", {"error": str(e)}, room=sid)
     finally:
-        # Limpiar estado global
-        analizando = False
-        await sio.emit("analysis_finished", room=browser_session["sid"])
-        browser_session = {
-            "metricas": None,
-            "inicio": None,
-            "duracion": None,
-            "prev_centro": None,
-            "config": None,
-            "sid": None,
-        } 
\ No newline at end of file
+        await sio.emit("analysis_finished", room=sid)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,135 @@
+import numpy as np
+
+
+class Columna:
+    """Columna NumPy que crece por duplicación (``append`` amortizado O(1)).
+
+    Guarda cada muestra en su tipo nativo (4 u 8 bytes) en lugar de un
+    ``float`` de Python dentro de una lista.
+    """
+
+    __slots__ = ("_datos", "_n")
+
+    def __init__(self, dtype=np.float32, capacidad=256):
+        self._datos = np.empty(capacidad, dtype=dtype)
+        self._n = 0
+
+    def append(self, valor):
+        if self._n == len(self._datos):
+            self._crecer()
+        self._datos[self._n] = valor
+        self._n += 1
+
+    def _crecer(self):
+        nuevo = np.empty(max(1, len(self._datos)) * 2, dtype=self._datos.dtype)
+        nuevo[:self._n] = self._datos[:self._n]
+        self._datos = nuevo
+
+    @property
+    def valores(self):
+        """Vista (sin copia) de las muestras almacenadas."""
+        return self._datos[:self._n]
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        return iter(self.valores)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.valores if dtype is None else self.valores.astype(dtype)
+
+
+class SerieTemporal:
+    """Serie ``(t, valor)`` en dos columnas: tiempo en float64 y valor en float32."""
+
+    __slots__ = ("t", "valor")
+
+    def __init__(self, capacidad=256):
+        self.t = Columna(np.float64, capacidad)
+        self.valor = Columna(np.float32, capacidad)
+
+    def agregar(self, t, valor):
+        self.t.append(t)
+        self.valor.append(valor)
+
+    def append(self, muestra):
+        """Compatibilidad con las listas de tuplas ``(t, valor)``."""
+        self.agregar(*muestra)
+
+    def __len__(self):
+        return len(self.t)
+
+    def __iter__(self):
+        return zip(self.t.valores.tolist(), self.valor.valores.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        datos = np.column_stack((self.t.valores, self.valor.valores))
+        return datos if dtype is None else datos.astype(dtype)
+
+
+class MetricasSesion:
+    """Contenedor compacto de las métricas de una sesión.
+
+    Contadores escalares en atributos (``__slots__``) y series en columnas
+    NumPy. Admite el acceso por clave de las métricas anteriores
+    (``metricas['frames_totales'] += 1``) y ``to_dict()`` exporta un dict con
+    arrays para ``generar_reporte_avanzado``.
+    """
+
+    _ESCALARES = (
+        'frames_totales', 'frames_contacto', 'gestos_totales', 'pausas_detectadas',
+        'palabras_por_minuto', 'tiempo_hablando', 'tiempo_silencio', 'cambios_postura',
+    )
+    _CONTEOS = ('expresiones_faciales', 'uso_espacio')
+    _COLUMNAS = ('distancias_mov', 'volumen_voz', 'postura_evaluacion')
+    _SERIES = (
+        'contacto_por_tiempo', 'gestos_por_tiempo', 'mov_por_tiempo',
+        'postura_por_tiempo', 'fluidez_por_tiempo',
+    )
+
+    __slots__ = _ESCALARES + _CONTEOS + _COLUMNAS + _SERIES
+
+    def __init__(self):
+        for nombre in self._ESCALARES:
+            setattr(self, nombre, 0)
+        self.expresiones_faciales = {'neutral': 0, 'sonrisa': 0, 'seria': 0}
+        self.uso_espacio = {'izquierda': 0, 'centro': 0, 'derecha': 0}
+        self.distancias_mov = Columna(np.float32)
+        self.volumen_voz = Columna(np.float32)
+        self.postura_evaluacion = Columna(np.int8)
+        for nombre in self._SERIES:
+            setattr(self, nombre, SerieTemporal())
+
+    # Acceso tipo dict para el código que trata las métricas como diccionario
+    def __getitem__(self, clave):
+        if clave not in self.__slots__:
+            raise KeyError(clave)
+        return getattr(self, clave)
+
+    def __setitem__(self, clave, valor):
+        if clave not in self.__slots__:
+            raise KeyError(clave)
+        setattr(self, clave, valor)
+
+    def __contains__(self, clave):
+        return clave in self.__slots__
+
+    def get(self, clave, por_defecto=None):
+        return getattr(self, clave) if clave in self.__slots__ else por_defecto
+
+    def keys(self):
+        return iter(self.__slots__)
+
+    def to_dict(self):
+        """Exporta las métricas: escalares, dicts de conteo y series como arrays NumPy.
+
+        Las columnas se exportan como arrays 1-D y las series temporales como
+        arrays ``(n, 2)`` con columnas ``(t, valor)``.
+        """
+        datos = {nombre: getattr(self, nombre) for nombre in self._ESCALARES}
+        for nombre in self._CONTEOS:
+            datos[nombre] = dict(getattr(self, nombre))
+        for nombre in self._COLUMNAS + self._SERIES:
+            datos[nombre] = np.asarray(getattr(self, nombre)).copy()
+        return datos
@@ -0,0 +1,114 @@
+"""Análisis offline de presentaciones grabadas.
+
+Aplica el mismo pipeline que el análisis en vivo (contacto visual, postura,
+movimiento y uso del espacio) a archivos de video, tan rápido como permita la
+CPU y sin el ritmo de tiempo real. Cada archivo se procesa en un proceso del
+pool, de modo que una carpeta de videos aprovecha todos los núcleos.
+
+Uso:
+    python offline.py grabacion1.mp4 grabacion2.mp4 --workers 4
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from analysis import reset_metrics
+from backends import configurar_hilos
+from pipeline import FrameAnalyzer
+from reporting import generar_reporte_avanzado
+
+# FPS supuestos cuando el contenedor no informa la tasa de cuadros
+FPS_POR_DEFECTO = 30.0
+
+
+def analizar_video(ruta, config=None):
+    """Analiza todos los frames de ``ruta``.
+
+    Devuelve ``(metricas, duracion)``, con la duración en segundos calculada a
+    partir del número de frames y los FPS del archivo.
+    """
+    config = config or {}
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        raise ValueError(f"No se pudo abrir el video: {ruta}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or FPS_POR_DEFECTO
+    metricas = reset_metrics()
+    analizador = FrameAnalyzer(metricas, config)
+
+    n_frames = 0
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            # El tiempo sale del índice del frame, no del reloj de pared
+            analizador.procesar(frame, n_frames / fps)
+            n_frames += 1
+    finally:
+        cap.release()
+
+    return metricas, n_frames / fps
+
+
+def procesar_archivo(ruta, config=None):
+    """Analiza un video y genera su reporte PDF (se ejecuta en un worker)."""
+    config = config or {}
+    metricas, duracion = analizar_video(ruta, config)
+    nombre = config.get("nombre") or os.path.splitext(os.path.basename(ruta))[0]
+    pdf_file = generar_reporte_avanzado(
+        nombre_usuario=nombre,
+        duracion=round(duracion, 1),
+        metricas=metricas,
+        config={"analisis_avanzado": config.get("analisis_avanzado", True)},
+    )
+    return {"archivo": ruta, "duracion": duracion, "metricas": metricas.to_dict(), "reporte": pdf_file}
+
+
+def analizar_archivos(rutas, config=None, workers=None, hilos_por_worker=1):
+    """Reparte ``rutas`` en un pool de procesos.
+
+    Genera ``(ruta, resultado, error)`` a medida que cada archivo termina; el
+    resultado es el dict de ``procesar_archivo`` o ``None`` si hubo error.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(rutas)) or 1,
+        # Con varios procesos en paralelo, que cada uno use todos los núcleos solo genera contención
+        initializer=configurar_hilos,
+        initargs=(hilos_por_worker,),
+    ) as pool:
+        futuros = {pool.submit(procesar_archivo, ruta, config): ruta for ruta in rutas}
+        for futuro in as_completed(futuros):
+            ruta = futuros[futuro]
+            try:
+                yield ruta, futuro.result(), None
+            except Exception as e:
+                yield ruta, None, e
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis offline de videos de presentaciones")
+    parser.add_argument("videos", nargs="+", help="Archivos de video a analizar")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, uno por núcleo)")
+    parser.add_argument("--hilos", type=int, default=1, help="Hilos de OpenCV/PyTorch por proceso")
+    parser.add_argument("--nombre", default=None, help="Nombre del presentador (por defecto, el del archivo)")
+    parser.add_argument("--basico", action="store_true", help="Desactiva el análisis avanzado")
+    args = parser.parse_args(argv)
+
+    config = {"nombre": args.nombre, "analisis_avanzado": not args.basico}
+
+    errores = 0
+    for ruta, resultado, error in analizar_archivos(args.videos, config, args.workers, args.hilos):
+        if error is not None:
+            errores += 1
+            print(f"❌ {ruta}: {error}")
+        else:
+            print(f"✅ {ruta}: {resultado['duracion']:.1f} s analizados → {resultado['reporte']}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+import math
+import os
+import time
+from collections import deque
+
+# FPS objetivo por defecto (se puede cambiar por sesión con "fps_objetivo")
+FPS_OBJETIVO = float(os.environ.get("ORATOR_FPS", 15))
+FPS_MAXIMO = 60.0
+
+# Niveles de degradación: primero se sacrifica la vista previa, nunca el análisis
+NIVELES = ("normal", "sin_anotacion", "resolucion_reducida")
+
+
+class FramePacer:
+    """Ritmo de frames por plazos con degradación progresiva.
+
+    Cada frame tiene un presupuesto de ``1 / fps_objetivo`` segundos. Entre
+    ``inicio()`` y ``fin()`` se mide el trabajo del frame y ``fin()`` devuelve
+    lo que queda hasta el plazo del siguiente (0 si ya se pasó), en lugar de
+    dormir un tiempo fijo. Los plazos no acumulan retraso: tras un frame lento
+    se sigue desde ahora, sin ráfagas para recuperar.
+
+    Si la carga media (tiempo de proceso / presupuesto) supera
+    ``umbral_alto`` se sube un nivel de ``NIVELES``; si baja de
+    ``umbral_bajo`` se recupera uno. Entre cambios pasan al menos
+    ``frames_minimos`` frames para no oscilar.
+    """
+
+    def __init__(self, fps_objetivo=FPS_OBJETIVO, umbral_alto=0.9, umbral_bajo=0.6,
+                 frames_minimos=15, ventana=2.0):
+        fps_objetivo = float(fps_objetivo or FPS_OBJETIVO)
+        if not math.isfinite(fps_objetivo):
+            fps_objetivo = FPS_OBJETIVO
+        self.fps_objetivo = min(FPS_MAXIMO, max(1.0, fps_objetivo))
+        self.presupuesto = 1.0 / self.fps_objetivo
+        self.umbral_alto = umbral_alto
+        self.umbral_bajo = umbral_bajo
+        self.frames_minimos = frames_minimos
+        self.ventana = ventana
+        self.nivel = 0
+        self.carga = 0.0  # media exponencial de tiempo de proceso / presupuesto
+        self.frames = 0
+        self._t0 = None
+        self._plazo = None
+        self._fines = deque()
+        self._desde_cambio = 0
+
+    def inicio(self):
+        self._t0 = time.monotonic()
+        if self._plazo is None:
+            self._plazo = self._t0
+
+    def fin(self):
+        """Cierra el frame; devuelve los segundos a esperar hasta el siguiente plazo."""
+        ahora = time.monotonic()
+        carga = (ahora - self._t0) / self.presupuesto if self._t0 is not None else 0.0
+        self.carga = carga if self.frames == 0 else 0.8 * self.carga + 0.2 * carga
+        self.frames += 1
+
+        self._fines.append(ahora)
+        while ahora - self._fines[0] > self.ventana:
+            self._fines.popleft()
+
+        self._ajustar_nivel()
+        self._plazo = max(self._plazo + self.presupuesto, ahora) if self._plazo is not None else ahora
+        return self._plazo - ahora
+
+    def _ajustar_nivel(self):
+        self._desde_cambio += 1
+        if self._desde_cambio < self.frames_minimos:
+            return
+        if self.carga > self.umbral_alto and self.nivel < len(NIVELES) - 1:
+            self.nivel += 1
+        elif self.carga < self.umbral_bajo and self.nivel > 0:
+            self.nivel -= 1
+        else:
+            return
+        self._desde_cambio = 0
+        print(f"⏱️ Carga {self.carga:.2f} del presupuesto: vista previa en modo {NIVELES[self.nivel]}")
+
+    @property
+    def fps(self):
+        """FPS conseguidos en los últimos ``ventana`` segundos."""
+        if len(self._fines) < 2:
+            return 0.0
+        return (len(self._fines) - 1) / max(1e-6, self._fines[-1] - self._fines[0])
+
+    def vista_previa(self):
+        """Cómo enviar la vista previa de este frame: ``(enviar, anotar, escala)``.
+
+        Con carga alta se deja de dibujar y se envía un frame de cada dos; si no
+        basta, además a mitad de resolución.
+        """
+        if self.nivel == 0:
+            return True, True, 1.0
+        return self.frames % 2 == 0, False, 1.0 if self.nivel == 1 else 0.5
+
+    def estado(self):
+        """Campos para ``live_metrics``."""
+        return {
+            'fps': round(self.fps, 1),
+            'fps_objetivo': self.fps_objetivo,
+            'degradacion': NIVELES[self.nivel],
+        }
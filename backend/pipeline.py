@@ -0,0 +1,362 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+from analysis import (
+    analyze_posture,
+    analyze_expression,
+    analyze_space_usage,
+    calculate_fluency,
+    analyze_eye_contact,
+)
+from inference import MOTOR, obtener_modelo
+from pose import DetectorGestos, contacto_visual_pose, extraer_pose
+from tracking import CadenciaDeteccion
+
+# Ventana deslizante (segundos) para gestos y postura en las métricas en vivo
+VENTANA = 3.0
+
+
+def extraer_detecciones(resultado):
+    """Convierte el ``Results`` de YOLO en una lista ``[(nombre, (x1, y1, x2, y2), score)]``.
+
+    Devuelve None si no hubo resultado de inferencia. El resto del pipeline
+    trabaja con esta lista, así los frames seguidos por el tracker (sin YOLO)
+    pasan por las mismas etapas.
+    """
+    if resultado is None or resultado.boxes is None:
+        return None
+    boxes = resultado.boxes
+    return [
+        (resultado.names[int(cls)], tuple(caja), float(score))
+        for cls, caja, score in zip(boxes.cls.tolist(), boxes.xyxy.cpu().numpy(), boxes.conf.tolist())
+    ]
+
+def seleccionar_persona(detecciones):
+    """Caja ``(x1, y1, x2, y2, cx, cy)`` de la persona de mayor área, o None."""
+    bbox_persona = None
+    area_mayor = 0
+    for nombre, (x1, y1, x2, y2), _ in detecciones or []:
+        if nombre != "person":
+            continue
+        area = (x2 - x1) * (y2 - y1)
+        if area > area_mayor:
+            bbox_persona = (x1, y1, x2, y2, (x1 + x2) / 2, (y1 + y2) / 2)
+            area_mayor = area
+    return bbox_persona
+
+def detecciones_seguidas(bbox_persona):
+    """Detecciones de un frame resuelto por el tracker: solo la persona seguida."""
+    return [("person", tuple(bbox_persona[:4]), None)]
+
+def contacto_visual(frame, bbox_persona):
+    """FaceMesh solo sobre la cabeza de la persona; sin persona no se ejecuta."""
+    if bbox_persona is None:
+        return None
+    return analyze_eye_contact(frame, bbox=bbox_persona)
+
+def seguir(cadencia, frame):
+    """Frame intermedio de la cadencia: sigue a la persona sin ejecutar YOLO.
+
+    Devuelve ``(eye_contact, detecciones, None)`` o None si el seguimiento se
+    perdió y hay que detectar en este frame. Con el motor de pose el contacto
+    visual es el de la última detección (sin FaceMesh); con el de detección,
+    FaceMesh sobre la caja seguida.
+    """
+    bbox_persona = cadencia.seguir(frame)
+    if bbox_persona is None:
+        return None
+    if MOTOR == "pose":
+        eye_contact = cadencia.contacto
+    else:
+        eye_contact = contacto_visual(frame, bbox_persona)
+    return eye_contact, detecciones_seguidas(bbox_persona), None
+
+def tras_deteccion(cadencia, frame, resultado):
+    """Procesa el ``Results`` de YOLO de un frame detectado.
+
+    Extrae detecciones y pose, reinicia el seguidor desde la persona y calcula
+    el contacto visual (keypoints con el motor de pose, si no FaceMesh sobre la
+    cabeza), que queda en ``cadencia.contacto`` para los frames seguidos.
+    Devuelve ``(eye_contact, detecciones, pose)``.
+    """
+    detecciones = extraer_detecciones(resultado)
+    pose = extraer_pose(resultado)
+    bbox_persona = seleccionar_persona(detecciones)
+    cadencia.tras_deteccion(frame, bbox_persona)
+    if pose is not None:
+        cadencia.contacto = contacto_visual_pose(pose)
+    else:
+        cadencia.contacto = contacto_visual(frame, bbox_persona)
+    return cadencia.contacto, detecciones, pose
+
+def predecir(frame, conf=0.4):
+    """YOLO síncrono sobre un frame con el modelo del hilo actual (modos sin event loop).
+
+    El servidor hace lo mismo de forma asíncrona con el micro-batching.
+    """
+    resultados = obtener_modelo().predict(source=frame, conf=conf, verbose=False)
+    return resultados[0] if len(resultados) > 0 else None
+
+def precalentar(ancho=640, alto=480):
+    """Carga y ejecuta una vez los modelos del hilo actual.
+
+    Así la carga de pesos, la compilación y las primeras asignaciones no las
+    paga el primer frame del primer usuario.
+    """
+    frame = np.zeros((alto, ancho, 3), dtype=np.uint8)
+    obtener_modelo().predict(source=frame, verbose=False)
+    if MOTOR != "pose":
+        analyze_eye_contact(frame)
+
+def dibujar_detecciones(frame, detecciones, en_sitio=False):
+    """``frame`` con las cajas y etiquetas dibujadas.
+
+    Por defecto dibuja sobre una copia; con ``en_sitio=True`` dibuja sobre el
+    propio ``frame`` (p. ej. un buffer de captura que ya no se va a analizar).
+    """
+    anotado = frame if en_sitio else frame.copy()
+    for nombre, (x1, y1, x2, y2), score in detecciones or []:
+        color = (80, 175, 76) if nombre == "person" else (255, 160, 60)
+        p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+        cv2.rectangle(anotado, p1, p2, color, 2)
+        etiqueta = nombre if score is None else f"{nombre} {score:.2f}"
+        cv2.putText(anotado, etiqueta, (p1[0], max(12, p1[1] - 5)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+    return anotado
+
+
+def superposicion(detecciones, bbox_persona, contacto, forma):
+    """Versión vectorial de ``dibujar_detecciones`` para que dibuje el cliente.
+
+    En lugar de un JPEG anotado devuelve las cajas ``[nombre, x1, y1, x2, y2,
+    score]`` en píxeles enteros del frame analizado, la caja de la persona
+    principal y el contacto visual; ``ancho`` y ``alto`` permiten escalarlas
+    al tamaño con el que el cliente muestra su vídeo.
+    """
+    return {
+        'ancho': int(forma[1]),
+        'alto': int(forma[0]),
+        'cajas': [
+            [nombre, int(x1), int(y1), int(x2), int(y2), None if score is None else round(float(score), 2)]
+            for nombre, (x1, y1, x2, y2), score in detecciones or []
+        ],
+        'persona': None if bbox_persona is None else [int(v) for v in bbox_persona[:4]],
+        'contacto': bool(contacto),
+    }
+
+
+class VentanaTemporal:
+    """Agregado incremental de muestras ``(t, valor)`` en los últimos ``segundos``.
+
+    Mantiene la suma y el número de muestras de la ventana: agregar y expirar
+    cuestan O(1) amortizado, en lugar de recorrer todo el historial por frame.
+    Los tiempos deben llegar en orden creciente.
+    """
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+        self._muestras = deque()
+        self.suma = 0.0
+
+    def agregar(self, t, valor):
+        self._muestras.append((t, valor))
+        self.suma += valor
+
+    def expirar(self, tiempo_actual):
+        """Descarta las muestras con ``tiempo_actual - t > segundos``."""
+        muestras = self._muestras
+        while muestras and tiempo_actual - muestras[0][0] > self.segundos:
+            self.suma -= muestras.popleft()[1]
+
+    def media(self, por_defecto=0.0):
+        return self.suma / len(self._muestras) if self._muestras else por_defecto
+
+    def __len__(self):
+        return len(self._muestras)
+
+
+class FrameAnalyzer:
+    """Pipeline de análisis por frame con el estado de una sesión.
+
+    Lo comparten el bucle de cámara, el modo navegador y el análisis offline.
+    La inferencia (``seguir`` / ``tras_deteccion``) se resuelve fuera y sus salidas se pasan a
+    ``analizar``, que aplica las etapas en orden: contacto visual, selección de
+    persona, movimiento, uso del espacio, gestos, postura y expresión. Cada
+    etapa es un método independiente para poder medirla por separado.
+    """
+
+    def __init__(self, metricas, config):
+        self.metricas = metricas
+        self.config = config
+        self.prev_centro = None
+        # YOLO cada N frames ("deteccion_cada") y seguimiento ligero entre medias
+        self.cadencia = CadenciaDeteccion(config.get('deteccion_cada', 1))
+        # Gestos por movimiento de muñecas (solo con el motor de pose)
+        self.gestos_pose = DetectorGestos()
+        self._frames_sin_pose = 0
+        # Agregados para las métricas en vivo (coste constante por frame)
+        self.ventana_gestos = VentanaTemporal(VENTANA)
+        self.ventana_posturas = VentanaTemporal(VENTANA)
+        self._mov_suma = 0.0
+        self._mov_n = 0
+        # Grabación en disco de los datos por frame (recording.GrabadorSesion), opcional.
+        # Con grabación las series por frame no se acumulan en memoria: el
+        # reporte las lee del disco (recording.metricas_sesion).
+        self.grabador = None
+        # Resultado del último frame analizado (para la superposición vectorial)
+        self.persona_actual = None
+        self.contacto_actual = False
+
+    def procesar(self, frame, tiempo_actual):
+        """Inferencia síncrona + análisis de un frame (modo offline).
+
+        Respeta la cadencia de detección: en los frames intermedios solo se
+        sigue la caja de la persona. Devuelve las detecciones usadas.
+        """
+        inferido = None
+        if not self.cadencia.debe_detectar():
+            inferido = seguir(self.cadencia, frame)
+        if inferido is None:
+            inferido = tras_deteccion(self.cadencia, frame, predecir(frame))
+        eye_contact, detecciones, pose = inferido
+        self.analizar(frame, tiempo_actual, eye_contact, detecciones, pose)
+        return detecciones
+
+    def analizar(self, frame, tiempo_actual, eye_contact, detecciones, pose=None):
+        """Actualiza las métricas con un frame ya inferido.
+
+        ``detecciones`` es la lista de ``extraer_detecciones`` (o de
+        ``detecciones_seguidas`` en los frames resueltos por el tracker).
+        ``pose`` son los keypoints de la persona con el motor de pose; de
+        ellos salen los gestos (movimiento de muñecas).
+        Devuelve la caja de la persona principal ``(x1, y1, x2, y2, cx, cy)``
+        o ``None`` si no se detectó a nadie.
+        """
+        ancho = frame.shape[1]
+        self.metricas.frames_totales += 1
+        self._frames_sin_pose += 1
+
+        contacto = self.etapa_contacto_visual(eye_contact)
+
+        bbox_persona = None
+        gestos = zona = postura = movimiento = None
+        if detecciones is not None:
+            gestos = 0
+            area_mayor = 0
+            for nombre, caja, _ in detecciones:
+                x1, y1, x2, y2 = caja
+                cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+                area = (x2 - x1) * (y2 - y1)
+
+                if nombre == "person":
+                    if area > area_mayor:
+                        bbox_persona = (x1, y1, x2, y2, cx, cy)
+                        area_mayor = area
+                    contacto = self.etapa_contacto_zona(cx, ancho, contacto)
+                    movimiento = self.etapa_movimiento(cx, cy)
+                    zona = self.etapa_espacio(cx, ancho)
+                elif nombre in ["hand", "face"]:
+                    gestos += 1
+
+            if pose is not None:
+                # Con detección cada N frames la pose anterior es de hace N frames
+                gestos += self.gestos_pose.actualizar(pose, self._frames_sin_pose)
+                self._frames_sin_pose = 0
+
+            self.etapa_gestos(tiempo_actual, gestos)
+            postura = self.etapa_postura(tiempo_actual, bbox_persona)
+
+        # Expresiones faciales solo en modo avanzado para ahorrar recursos
+        if self.config.get('analisis_avanzado') and bbox_persona:
+            self.etapa_expresion(frame, bbox_persona)
+
+        if self.grabador is not None:
+            self.grabador.registrar(tiempo_actual, bbox_persona, contacto, zona, gestos, postura, movimiento)
+
+        self.persona_actual = bbox_persona
+        self.contacto_actual = contacto
+        return bbox_persona
+
+    # ------------------------------
+    #  Etapas
+    # ------------------------------
+    def etapa_contacto_visual(self, eye_contact):
+        if eye_contact is True:
+            self.metricas.frames_contacto += 1
+            return True
+        return False
+
+    def etapa_contacto_zona(self, cx, ancho, contacto):
+        """Sin rostro detectado, una persona en el centro cuenta como contacto."""
+        if not contacto and ancho * 0.3 < cx < ancho * 0.7:
+            self.metricas.frames_contacto += 1
+            return True
+        return contacto
+
+    def etapa_movimiento(self, cx, cy):
+        dist = None
+        if self.prev_centro:
+            dist = ((cx - self.prev_centro[0])**2 + (cy - self.prev_centro[1])**2)**0.5
+            if self.grabador is None:
+                self.metricas.distancias_mov.append(dist)
+            self._mov_suma += dist
+            self._mov_n += 1
+        self.prev_centro = (cx, cy)
+        return dist
+
+    def etapa_espacio(self, cx, ancho):
+        zona = analyze_space_usage(cx, ancho)
+        self.metricas.uso_espacio[zona] += 1
+        return zona
+
+    def etapa_gestos(self, tiempo_actual, gestos):
+        self.metricas.gestos_totales += gestos
+        if self.grabador is None:
+            self.metricas.gestos_por_tiempo.agregar(tiempo_actual, gestos)
+        self.ventana_gestos.agregar(tiempo_actual, gestos)
+
+    def etapa_postura(self, tiempo_actual, bbox_persona):
+        if bbox_persona is None:
+            return None
+        postura = analyze_posture(bbox_persona)
+        if self.grabador is None:
+            self.metricas.postura_evaluacion.append(postura)
+            self.metricas.postura_por_tiempo.agregar(tiempo_actual, postura)
+        self.ventana_posturas.agregar(tiempo_actual, postura)
+        return postura
+
+    def etapa_expresion(self, frame, bbox_persona):
+        expresion = analyze_expression(frame, bbox_persona)
+        self.metricas.expresiones_faciales[expresion] += 1
+
+    # ------------------------------
+    #  Métricas en tiempo real
+    # ------------------------------
+    def metricas_en_vivo(self, tiempo_actual, duracion):
+        """Métricas para el evento ``live_metrics`` (tipos nativos de Python)."""
+        metricas = self.metricas
+        contacto_pct = (
+            metricas.frames_contacto / metricas.frames_totales * 100
+            if metricas.frames_totales > 0 else 0
+        )
+        # Ventana deslizante de 3 segundos para gestos y postura
+        self.ventana_gestos.expirar(tiempo_actual)
+        self.ventana_posturas.expirar(tiempo_actual)
+        gestos_seg = self.ventana_gestos.suma / VENTANA if len(self.ventana_gestos) else 0
+        mov_prom = float(self._mov_suma / self._mov_n) if self._mov_n else 0.0
+        postura_prom = float(self.ventana_posturas.media(por_defecto=5.0))
+        expresividad = min(10, gestos_seg * 3 + 3)
+        fluidez = float(calculate_fluency(metricas))
+
+        return {
+            'contacto': contacto_pct,
+            'gestos': gestos_seg,
+            'movimiento': mov_prom,
+            'postura': postura_prom,
+            'expresividad': expresividad,
+            'fluidez': fluidez,
+            'progreso': (tiempo_actual / duracion) * 100,
+            'tiempo_actual': tiempo_actual,
+        }
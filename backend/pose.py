@@ -0,0 +1,87 @@
+import numpy as np
+
+# Índices de keypoints COCO que entrega YOLOv8-pose
+NARIZ = 0
+OJO_IZQ = 1
+OJO_DER = 2
+HOMBRO_IZQ = 5
+HOMBRO_DER = 6
+MUNECA_IZQ = 9
+MUNECA_DER = 10
+
+# Confianza mínima para usar un keypoint
+CONF_MINIMA = 0.5
+
+
+def extraer_pose(resultado):
+    """Keypoints ``(17, 3)`` (x, y, conf) de la persona de mayor área, o None.
+
+    Devuelve None si el modelo no es de pose o no hay personas.
+    """
+    if resultado is None or resultado.boxes is None or getattr(resultado, "keypoints", None) is None:
+        return None
+    cajas = resultado.boxes.xyxy.cpu().numpy()
+    if len(cajas) == 0:
+        return None
+    areas = (cajas[:, 2] - cajas[:, 0]) * (cajas[:, 3] - cajas[:, 1])
+    return resultado.keypoints.data.cpu().numpy()[int(np.argmax(areas))]
+
+
+def contacto_visual_pose(keypoints, umbral=0.3):
+    """Contacto visual aproximado a partir de nariz y ojos.
+
+    Compara el desplazamiento horizontal de la nariz respecto al centro de los
+    ojos con la distancia entre ojos (así no depende del tamaño de la persona
+    en el frame). Devuelve None si los keypoints no son fiables.
+    """
+    nariz, ojo_izq, ojo_der = keypoints[NARIZ], keypoints[OJO_IZQ], keypoints[OJO_DER]
+    if min(nariz[2], ojo_izq[2], ojo_der[2]) < CONF_MINIMA:
+        return None
+    distancia_ojos = abs(ojo_izq[0] - ojo_der[0])
+    if distancia_ojos < 1:
+        return False
+    centro_ojos = (ojo_izq[0] + ojo_der[0]) / 2.0
+    return bool(abs(nariz[0] - centro_ojos) / distancia_ojos < umbral)
+
+
+class DetectorGestos:
+    """Cuenta gestos a partir del movimiento de las muñecas.
+
+    El desplazamiento de cada muñeca entre frames se normaliza por el ancho de
+    hombros (y por los frames transcurridos si la pose no se calcula en todos);
+    un gesto es el paso de "quieta" a "en movimiento", de modo que un
+    ademán sostenido cuenta una sola vez y no una por frame.
+    """
+
+    def __init__(self, umbral=0.12):
+        self.umbral = umbral
+        self._previas = [None, None]
+        self._en_movimiento = [False, False]
+
+    def actualizar(self, keypoints, frames=1):
+        """Devuelve el número de gestos que empiezan en este frame (0, 1 o 2).
+
+        ``frames`` son los frames transcurridos desde la pose anterior: el umbral
+        se aplica al desplazamiento medio por frame.
+        """
+        hombro_izq, hombro_der = keypoints[HOMBRO_IZQ], keypoints[HOMBRO_DER]
+        if min(hombro_izq[2], hombro_der[2]) < CONF_MINIMA:
+            return 0
+        escala = max(1.0, float(np.hypot(*(hombro_izq[:2] - hombro_der[:2]))))
+
+        gestos = 0
+        for lado, indice in enumerate((MUNECA_IZQ, MUNECA_DER)):
+            muneca = keypoints[indice]
+            if muneca[2] < CONF_MINIMA:
+                self._previas[lado] = None
+                self._en_movimiento[lado] = False
+                continue
+            previa = self._previas[lado]
+            self._previas[lado] = muneca[:2].copy()
+            if previa is None:
+                continue
+            moviendo = float(np.hypot(*(muneca[:2] - previa))) / escala / max(1, frames) > self.umbral
+            if moviendo and not self._en_movimiento[lado]:
+                gestos += 1
+            self._en_movimiento[lado] = moviendo
+        return gestos
@@ -0,0 +1,258 @@
+"""Grabación en disco de los datos por frame de una sesión.
+
+Cada sesión escribe un registro binario de tamaño fijo por frame analizado
+(tiempo, caja de la persona, contacto visual, postura, zona, movimiento y
+gestos) en un archivo de solo anexado. Los registros se acumulan en un buffer
+NumPy y se vuelcan al archivo cada ``FLUSH_SEGUNDOS`` o cuando el buffer se
+llena, así que un fallo del proceso pierde como mucho ese intervalo.
+
+Mientras se graba, las series por frame solo se guardan en disco (la sesión
+en memoria se queda con contadores y sumas); el reporte y el historial las
+leen de la grabación con ``metricas_sesion``. La carpeta tiene la misma
+retención por antigüedad y tamaño que los reportes.
+
+Formato: ``MAGIA`` + longitud (uint32) + cabecera JSON (dtype y datos de la
+sesión) seguidos de los registros con el dtype de ``REGISTRO``. ``leer_grabacion``
+los abre con ``np.memmap`` sin cargarlos en memoria.
+
+Uso:
+    python recording.py grabaciones/20250101_120000_<sid>.orec
+"""
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from analysis import reset_metrics
+from retention import aplicar_retencion
+
+MAGIA = b"ORATREC1"
+VERSION = 1
+
+# Carpeta de grabaciones; vacía desactiva la grabación
+DIRECTORIO_GRABACIONES = os.environ.get("ORATOR_GRABACIONES", "grabaciones")
+FLUSH_SEGUNDOS = 1.0
+# Retención: se borran las grabaciones más antiguas que GRABACIONES_MAX_DIAS
+# y, si la carpeta supera GRABACIONES_MAX_MB, las más antiguas hasta bajar del límite
+GRABACIONES_MAX_MB = float(os.environ.get("ORATOR_GRABACIONES_MAX_MB", 500))
+GRABACIONES_MAX_DIAS = float(os.environ.get("ORATOR_GRABACIONES_MAX_DIAS", 7))
+
+# Columnas de un registro. Sin persona la caja, la postura y el movimiento
+# quedan en NaN y ``zona`` en -1; ``gestos`` es -1 si el frame no tuvo
+# resultado de inferencia.
+REGISTRO = np.dtype([
+    ('t', '<f8'),
+    ('x1', '<f4'), ('y1', '<f4'), ('x2', '<f4'), ('y2', '<f4'),
+    ('contacto', 'i1'),
+    ('zona', 'i1'),
+    ('gestos', 'i1'),
+    ('postura', '<f4'),
+    ('movimiento', '<f4'),
+])
+
+ZONAS = ('izquierda', 'centro', 'derecha')
+
+# Grabaciones abiertas en este proceso: la retención no las toca
+_abiertas = set()
+
+
+class GrabadorSesion:
+    """Escritor de registros por frame de una sesión en ``ruta``.
+
+    ``registrar`` se llama desde el event loop; ``para_sesion``, ``flush`` y
+    ``cerrar`` tocan el disco y el servidor los ejecuta en un hilo aparte
+    (``asyncio.to_thread``). Un lock serializa el acceso al buffer y al archivo.
+    """
+
+    def __init__(self, ruta, datos=None, capacidad=256, flush_segundos=FLUSH_SEGUNDOS):
+        self.ruta = ruta
+        self.flush_segundos = flush_segundos
+        self.registros = 0
+        self._buffer = np.zeros(capacidad, dtype=REGISTRO)
+        self._n = 0
+        self._ultimo_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        cabecera = json.dumps({
+            "version": VERSION,
+            "campos": REGISTRO.descr,
+            **(datos or {}),
+        }, default=str).encode()
+        self._archivo = open(ruta, "wb")
+        self._archivo.write(MAGIA + struct.pack("<I", len(cabecera)) + cabecera)
+        self._archivo.flush()
+        _abiertas.add(os.path.abspath(ruta))
+
+    @classmethod
+    def para_sesion(cls, sid, config, directorio=DIRECTORIO_GRABACIONES):
+        """Grabador en ``directorio`` para una sesión, o None si la grabación está desactivada.
+
+        Si el disco falla (sin espacio, sin permisos) la sesión sigue sin grabación.
+        """
+        if not directorio or not config.get("grabar", True):
+            return None
+        nombre = f"{time.strftime('%Y%m%d_%H%M%S')}_{sid}.orec"
+        datos = {"sid": sid, "inicio": time.time(), "nombre": config.get("nombre"), "config": config}
+        try:
+            limpiar_grabaciones(directorio)
+            return cls(os.path.join(directorio, nombre), datos)
+        except OSError as e:
+            print(f"⚠️ Sesión {sid} sin grabación: {e}")
+            return None
+
+    def registrar(self, t, bbox_persona, contacto, zona, gestos, postura, movimiento):
+        with self._lock:
+            if self._archivo is None:
+                return  # frame que terminó de inferirse después de cerrar la sesión
+            self._registrar(t, bbox_persona, contacto, zona, gestos, postura, movimiento)
+
+    def _registrar(self, t, bbox_persona, contacto, zona, gestos, postura, movimiento):
+        registro = self._buffer[self._n]
+        registro['t'] = t
+        if bbox_persona is not None:
+            registro['x1'], registro['y1'], registro['x2'], registro['y2'] = bbox_persona[:4]
+        else:
+            registro['x1'] = registro['y1'] = registro['x2'] = registro['y2'] = np.nan
+        registro['contacto'] = bool(contacto)
+        registro['zona'] = ZONAS.index(zona) if zona in ZONAS else -1
+        registro['gestos'] = -1 if gestos is None else min(127, gestos)
+        registro['postura'] = np.nan if postura is None else postura
+        registro['movimiento'] = np.nan if movimiento is None else movimiento
+        self._n += 1
+        self.registros += 1
+
+        if self._n == len(self._buffer) or time.monotonic() - self._ultimo_flush >= self.flush_segundos:
+            self._volcar()
+
+    def flush(self):
+        """Vuelca los registros pendientes al archivo (y al sistema operativo)."""
+        with self._lock:
+            self._volcar()
+
+    def _volcar(self):
+        if self._archivo is None:
+            return
+        if self._n:
+            self._archivo.write(self._buffer[:self._n].tobytes())
+            self._n = 0
+        self._archivo.flush()
+        self._ultimo_flush = time.monotonic()
+
+    def cerrar(self):
+        with self._lock:
+            if self._archivo is None:
+                return
+            try:
+                self._volcar()
+                os.fsync(self._archivo.fileno())
+            except OSError as e:
+                print(f"⚠️ Error al cerrar la grabación {self.ruta}: {e}")
+            finally:
+                self._archivo.close()
+                self._archivo = None
+                _abiertas.discard(os.path.abspath(self.ruta))
+
+
+def limpiar_grabaciones(directorio=DIRECTORIO_GRABACIONES, max_mb=GRABACIONES_MAX_MB,
+                        max_dias=GRABACIONES_MAX_DIAS):
+    """Aplica la retención de ``directorio`` sin tocar las grabaciones abiertas."""
+    return aplicar_retencion(directorio, ".orec", max_mb, max_dias, conservar=tuple(_abiertas))
+
+
+def leer_cabecera(ruta):
+    """Devuelve ``(cabecera, desplazamiento)`` de una grabación."""
+    with open(ruta, "rb") as f:
+        if f.read(len(MAGIA)) != MAGIA:
+            raise ValueError(f"No es una grabación de sesión: {ruta}")
+        (longitud,) = struct.unpack("<I", f.read(4))
+        cabecera = json.loads(f.read(longitud))
+    return cabecera, len(MAGIA) + 4 + longitud
+
+
+def leer_grabacion(ruta):
+    """Registros de ``ruta`` como array estructurado mapeado en memoria (solo lectura).
+
+    Si el proceso terminó a mitad de un volcado, el registro incompleto del
+    final se ignora.
+    """
+    cabecera, desplazamiento = leer_cabecera(ruta)
+    dtype = np.dtype([tuple(campo) for campo in cabecera["campos"]])
+    n = (os.path.getsize(ruta) - desplazamiento) // dtype.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(ruta, dtype=dtype, mode="r", offset=desplazamiento, shape=(n,))
+
+
+def metricas_desde_grabacion(ruta):
+    """Reconstruye las métricas de la sesión a partir de su grabación.
+
+    Sirve para generar el reporte de una sesión cuyo proceso terminó antes
+    de tiempo. Devuelve ``(metricas, duracion)``; las expresiones faciales no
+    se graban y quedan a cero.
+    """
+    r = leer_grabacion(ruta)
+    metricas = reset_metrics()
+    if len(r) == 0:
+        return metricas, 0.0
+
+    t = np.asarray(r['t'])
+    metricas.frames_totales = len(r)
+    metricas.frames_contacto = int(np.count_nonzero(r['contacto']))
+    zonas = np.bincount(r['zona'][r['zona'] >= 0], minlength=len(ZONAS))
+    for nombre, cuenta in zip(ZONAS, zonas):
+        metricas.uso_espacio[nombre] = int(cuenta)
+
+    for valor in r['movimiento'][~np.isnan(r['movimiento'])].tolist():
+        metricas.distancias_mov.append(valor)
+
+    con_inferencia = r['gestos'] >= 0
+    metricas.gestos_totales = int(r['gestos'][con_inferencia].sum())
+    for ti, gestos in zip(t[con_inferencia].tolist(), r['gestos'][con_inferencia].tolist()):
+        metricas.gestos_por_tiempo.agregar(ti, gestos)
+
+    con_postura = ~np.isnan(r['postura'])
+    for ti, postura in zip(t[con_postura].tolist(), r['postura'][con_postura].tolist()):
+        metricas.postura_evaluacion.append(postura)
+        metricas.postura_por_tiempo.agregar(ti, postura)
+    return metricas, float(t[-1])
+
+
+def metricas_sesion(metricas, ruta):
+    """Métricas completas de una sesión grabada.
+
+    Las series por frame salen de la grabación y el resto (contadores,
+    expresiones faciales) de ``metricas``, un ``MetricasSesion`` o su
+    ``to_dict()``.
+    """
+    completas, _ = metricas_desde_grabacion(ruta)
+    for nombre in completas._ESCALARES + completas._CONTEOS:
+        valor = metricas[nombre]
+        completas[nombre] = dict(valor) if isinstance(valor, dict) else valor
+    return completas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumen de una grabación de sesión")
+    parser.add_argument("grabacion", help="Archivo .orec")
+    args = parser.parse_args(argv)
+
+    cabecera, _ = leer_cabecera(args.grabacion)
+    r = leer_grabacion(args.grabacion)
+    print(f"🎞️ {args.grabacion}: sesión {cabecera.get('sid')} de {cabecera.get('nombre') or 'Usuario'}")
+    if len(r) == 0:
+        print("Sin registros")
+        return 0
+    print(f"  {len(r)} frames en {r['t'][-1]:.1f} s")
+    print(f"  Persona detectada: {np.count_nonzero(~np.isnan(r['x1'])) / len(r) * 100:.1f}%")
+    print(f"  Contacto visual: {np.count_nonzero(r['contacto']) / len(r) * 100:.1f}%")
+    print(f"  Movimiento medio: {np.nanmean(r['movimiento']) if np.any(~np.isnan(r['movimiento'])) else 0:.1f} px")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,171 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from recording import metricas_sesion
+from reporting import generar_reporte_avanzado
+
+# Procesos dedicados a generar reportes (matplotlib + reportlab) y número de
+# trabajos que se recuerdan para la descarga por HTTP.
+REPORT_WORKERS = int(os.environ.get("ORATOR_REPORT_WORKERS", 2))
+MAX_TRABAJOS = 500
+
+# Cola de progreso compartida con los procesos del pool (se hereda en el initializer)
+_cola_progreso = None
+
+
+def _inicializar_worker(cola):
+    global _cola_progreso
+    _cola_progreso = cola
+
+
+def _generar_en_worker(job_id, parametros, grabacion=None):
+    """Genera el PDF en el proceso worker informando del progreso al servidor.
+
+    Con ``grabacion`` las series por frame se leen de ese archivo aquí, fuera
+    del proceso del servidor.
+    """
+    def progreso(porcentaje, mensaje):
+        _cola_progreso.put((job_id, porcentaje, mensaje))
+
+    if grabacion is not None and os.path.exists(grabacion):
+        parametros["metricas"] = metricas_sesion(parametros["metricas"], grabacion)
+
+    return generar_reporte_avanzado(**parametros, progreso=progreso)
+
+
+class ReportJob:
+    """Trabajo de generación de un reporte."""
+
+    def __init__(self, sid, nombre_usuario):
+        self.id = uuid.uuid4().hex
+        self.sid = sid
+        self.nombre_usuario = nombre_usuario
+        self.estado = "en_cola"  # en_cola | generando | listo | error
+        self.progreso = 0
+        self.archivo = None
+        self.error = None
+        self.creado = time.time()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "estado": self.estado,
+            "progreso": self.progreso,
+            "error": self.error,
+        }
+
+
+class ReportQueue:
+    """Cola de reportes ejecutada en un pool de procesos.
+
+    ``encolar`` devuelve enseguida; el PDF se genera en otro proceso, sin
+    bloquear el event loop, y ``notificar(evento, datos, sid)`` (normalmente
+    ``sio.emit``) recibe ``report_progress`` durante la generación y
+    ``report_generated`` o ``analysis_error`` al terminar.
+    """
+
+    def __init__(self, notificar, workers=None):
+        self.notificar = notificar
+        self.workers = workers or REPORT_WORKERS
+        self.trabajos = OrderedDict()
+        self._pool = None
+        self._cola = None
+        self._loop = None
+
+    def _iniciar(self):
+        # "spawn": el servidor tiene hilos (pool de inferencia) y hacer fork
+        # de un proceso con hilos puede dejar locks tomados en el hijo.
+        contexto = multiprocessing.get_context("spawn")
+        if self._cola is None:
+            self._cola = contexto.Queue()
+            self._loop = asyncio.get_running_loop()
+            threading.Thread(target=self._escuchar_progreso, daemon=True).start()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=contexto,
+            initializer=_inicializar_worker,
+            initargs=(self._cola,),
+        )
+
+    def _escuchar_progreso(self):
+        while True:
+            try:
+                mensaje = self._cola.get()
+            except (EOFError, OSError):
+                break
+            if mensaje is None:
+                break
+            asyncio.run_coroutine_threadsafe(self._progreso(*mensaje), self._loop)
+
+    async def _progreso(self, job_id, porcentaje, mensaje):
+        trabajo = self.trabajos.get(job_id)
+        if trabajo is None or trabajo.estado in ("listo", "error"):
+            return
+        trabajo.estado = "generando"
+        trabajo.progreso = porcentaje
+        await self.notificar(
+            "report_progress",
+            {"job_id": job_id, "progreso": porcentaje, "mensaje": mensaje},
+            trabajo.sid,
+        )
+
+    def obtener(self, job_id):
+        return self.trabajos.get(job_id)
+
+    async def encolar(self, sid, nombre_usuario, duracion, metricas, config, grabacion=None):
+        """Encola el reporte de una sesión y devuelve su ``ReportJob``.
+
+        ``grabacion`` es la ruta de la grabación de la sesión (``recording``),
+        de donde el worker toma las series por frame.
+        """
+        if self._pool is None:
+            self._iniciar()
+
+        trabajo = ReportJob(sid, nombre_usuario)
+        self.trabajos[trabajo.id] = trabajo
+        while len(self.trabajos) > MAX_TRABAJOS:
+            self.trabajos.popitem(last=False)
+
+        parametros = {
+            "nombre_usuario": nombre_usuario,
+            "duracion": duracion,
+            # Solo viajan arrays y escalares entre procesos
+            "metricas": metricas.to_dict() if hasattr(metricas, "to_dict") else metricas,
+            "config": config,
+        }
+        futuro = self._loop.run_in_executor(self._pool, _generar_en_worker, trabajo.id, parametros, grabacion)
+        asyncio.create_task(self._esperar(trabajo, futuro))
+        await self.notificar("report_progress", {"job_id": trabajo.id, "progreso": 0, "mensaje": "En cola"}, sid)
+        return trabajo
+
+    async def _esperar(self, trabajo, futuro):
+        try:
+            trabajo.archivo = await futuro
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # Un worker murió (p. ej. sin memoria): el siguiente trabajo crea otro pool
+                self._pool = None
+            trabajo.estado = "error"
+            trabajo.error = str(e)
+            print(f"❌ Error al generar reporte {trabajo.id}: {e}")
+            await self.notificar("analysis_error", {"error": f"No se pudo generar el reporte: {e}"}, trabajo.sid)
+            return
+        trabajo.estado = "listo"
+        trabajo.progreso = 100
+        await self.notificar(
+            "report_generated",
+            {"job_id": trabajo.id, "file_path": trabajo.archivo, "url": f"/reports/{trabajo.id}"},
+            trabajo.sid,
+        )
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._cola.put(None)
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,14 +1,30 @@
 import os
 import io
+import hashlib
+import json
+import threading
+from functools import lru_cache
 from datetime import datetime
-import matplotlib.pyplot as plt
 import numpy as np
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
+
+from retention import aplicar_retencion
+
+# matplotlib y reportlab solo se necesitan al generar un reporte: se importan
+# dentro de las funciones para no retrasar el arranque del servidor.
+
+# Resolución por defecto de los gráficos (se puede cambiar por reporte con config['dpi'])
+DPI_GRAFICOS = int(os.environ.get("ORATOR_REPORT_DPI", 150))
+
+# Carpeta de reportes y política de retención: se borran los PDF con más de
+# REPORTES_MAX_DIAS días y, si aun así se supera REPORTES_MAX_MB, los usados
+# hace más tiempo.
+DIRECTORIO_REPORTES = "reportes"
+REPORTES_MAX_MB = float(os.environ.get("ORATOR_REPORTES_MAX_MB", 500))
+REPORTES_MAX_DIAS = float(os.environ.get("ORATOR_REPORTES_MAX_DIAS", 7))
+
+# Forma parte de la clave de caché: se incrementa al cambiar el diseño del
+# PDF para que no se sirvan reportes con el formato anterior.
+FORMATO_REPORTE = 1
 
 # Ruta del logo (se intenta primero en raíz y luego en frontend)
 LOGO_PATH = None
@@ -20,17 +36,85 @@ for candidate in [
         LOGO_PATH = candidate
         break
 
-def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config):
-    """Generar reporte PDF avanzado con todas las métricas"""
-    
+def _sin_progreso(porcentaje, mensaje):
+    pass
+
+@lru_cache(maxsize=1)
+def _logo():
+    """Logo decodificado una sola vez por proceso (None si no hay logo)."""
+    if not LOGO_PATH:
+        return None
+    from reportlab.lib.utils import ImageReader
+
+    try:
+        return ImageReader(LOGO_PATH)
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar el logo: {e}")
+        return None
+
+def clave_reporte(nombre_usuario, duracion, metricas, config, fecha):
+    """Hash SHA-256 del contenido de un reporte (métricas exportadas + parámetros).
+
+    ``fecha`` es la que se imprime en el PDF: forma parte de la clave para que
+    un acierto de caché nunca sirva un reporte con otra fecha.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([FORMATO_REPORTE, nombre_usuario, duracion, config, fecha], sort_keys=True, default=str).encode())
+    for nombre in sorted(metricas):
+        valor = metricas[nombre]
+        h.update(nombre.encode())
+        if isinstance(valor, np.ndarray):
+            h.update(f"{valor.dtype.str}{valor.shape}".encode())
+            h.update(np.ascontiguousarray(valor).tobytes())
+        else:
+            h.update(json.dumps(valor, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+def limpiar_reportes(directorio=DIRECTORIO_REPORTES, max_mb=REPORTES_MAX_MB, max_dias=REPORTES_MAX_DIAS, conservar=()):
+    """Aplica la retención de ``directorio``; devuelve los archivos borrados.
+
+    Los aciertos de caché renuevan la fecha de modificación, así que por
+    tamaño se borran primero los reportes menos usados.
+    """
+    return aplicar_retencion(directorio, ".pdf", max_mb, max_dias, conservar)
+
+def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config, progreso=None):
+    """Generar reporte PDF avanzado con todas las métricas
+
+    ``progreso(porcentaje, mensaje)`` es opcional y se llama en cada etapa.
+    El archivo se nombra con el hash del contenido: si ya existe un reporte
+    para las mismas métricas y configuración en el mismo día se devuelve sin
+    volver a generarlo.
+    """
+    progreso = progreso or _sin_progreso
+
+    # Acepta el contenedor compacto (MetricasSesion) o un dict ya exportado
+    if hasattr(metricas, 'to_dict'):
+        metricas = metricas.to_dict()
+
     # Crear carpeta de reportes
-    if not os.path.exists("reportes"):
-        os.makedirs("reportes")
-        
+    os.makedirs(DIRECTORIO_REPORTES, exist_ok=True)
+
+    # Solo el día: con la hora, la caché no acertaría nunca pasado un minuto
+    fecha = datetime.now().strftime('%d/%m/%Y')
+
     # Nombre del archivo
-    ahora = datetime.now().strftime("%Y%m%d_%H%M%S")
-    pdf_filename = f"reportes/reporte_avanzado_{nombre_usuario}_{ahora}.pdf"
-    
+    clave = clave_reporte(nombre_usuario, duracion, metricas, config, fecha)
+    pdf_filename = f"{DIRECTORIO_REPORTES}/reporte_avanzado_{nombre_usuario}_{clave[:16]}.pdf"
+    if os.path.exists(pdf_filename):
+        os.utime(pdf_filename)  # renueva su último uso para la retención
+        progreso(95, "Reporte recuperado de caché")
+        print(f"♻️ PDF en caché: {pdf_filename}")
+        return pdf_filename
+
+    progreso(5, "Preparando reporte")
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+
     # ------------------------------
     #  Funciones de diseño por página
     # ------------------------------
@@ -47,9 +131,9 @@ def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config):
         canvas.rect(0, doc.pagesize[1] - 40, doc.pagesize[0], 40, fill=1, stroke=0)
 
         # Logo en esquina superior derecha (si existe)
-        if LOGO_PATH:
+        if _logo() is not None:
             try:
-                canvas.drawImage(LOGO_PATH, doc.pagesize[0] - 60, doc.pagesize[1] - 35, width=50, height=30, mask='auto', preserveAspectRatio=True)
+                canvas.drawImage(_logo(), doc.pagesize[0] - 60, doc.pagesize[1] - 35, width=50, height=30, mask='auto', preserveAspectRatio=True)
             except Exception as _:
                 pass
 
@@ -58,20 +142,22 @@ def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config):
     def _draw_first_page(canvas, doc):
         """Portada con logo grande"""
         _draw_page_background(canvas, doc)
-        if LOGO_PATH:
+        if _logo() is not None:
             try:
                 # Centro de la portada
                 logo_width = 200
                 logo_height = 120
                 x = (doc.pagesize[0] - logo_width) / 2
                 y = doc.pagesize[1] - 200
-                canvas.drawImage(LOGO_PATH, x, y, width=logo_width, height=logo_height, mask='auto', preserveAspectRatio=True)
+                canvas.drawImage(_logo(), x, y, width=logo_width, height=logo_height, mask='auto', preserveAspectRatio=True)
             except Exception as _:
                 pass
 
-    # Crear documento con callbacks de página
+    # Crear documento con callbacks de página. Se escribe en un temporal y se
+    # renombra al final: otro proceso con la misma clave nunca ve un PDF a medias.
+    temporal = f"{pdf_filename}.{os.getpid()}.tmp"
     doc = SimpleDocTemplate(
-        pdf_filename,
+        temporal,
         pagesize=letter,
         topMargin=72,
         bottomMargin=72,
@@ -109,7 +195,7 @@ def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config):
     # Información básica
     info_data = [
         ["Presentador:", nombre_usuario],
-        ["Fecha:", datetime.now().strftime('%d/%m/%Y %H:%M')],
+        ["Fecha:", fecha],
         ["Duración:", f"{duracion} segundos"],
         ["Tipo de análisis:", "Avanzado" if config.get('analisis_avanzado', True) else "Básico"]
     ]
@@ -124,21 +210,18 @@ def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config):
     elementos.append(Spacer(1, 0.5*inch))
     
     # Calcular métricas finales (con manejo de errores)
-    frames_totales = max(1, metricas.get('frames_totales', 1))
-    contacto_pct = (metricas.get('frames_contacto', 0) / frames_totales) * 100
-    gestos_seg = metricas.get('gestos_totales', 0) / max(1, duracion)
-    
-    distancias = metricas.get('distancias_mov', [])
-    mov_prom = sum(distancias) / max(1, len(distancias)) if distancias else 0
-    
-    posturas = metricas.get('postura_evaluacion', [])
-    postura_prom = sum(posturas) / max(1, len(posturas)) if posturas else 5
+    progreso(15, "Calculando métricas")
+    resumen = resumen_metricas(metricas, duracion)
+    contacto_pct = resumen['contacto_pct']
+    gestos_seg = resumen['gestos_seg']
+    mov_prom = resumen['movimiento']
+    postura_prom = resumen['postura']
     
     # Resumen ejecutivo
     elementos.append(Paragraph("Resumen Ejecutivo", estilo_subtitulo))
     
     # Puntuación general (sobre 100)
-    puntuacion_general = calcular_puntuacion_general(metricas, contacto_pct, gestos_seg, mov_prom, postura_prom)
+    puntuacion_general = resumen['puntuacion']
     
     resumen_data = [
         ["Puntuación General", f"{puntuacion_general}/100", get_evaluacion_color(puntuacion_general)],
@@ -165,8 +248,11 @@ def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config):
     elementos.append(Paragraph("Análisis Detallado", estilo_titulo))
     
     # Crear y añadir gráficos mejorados
+    progreso(30, "Generando gráficos")
     try:
-        graficos = crear_graficos_avanzados(metricas, contacto_pct, gestos_seg, mov_prom)
+        graficos = crear_graficos_avanzados(
+            metricas, contacto_pct, gestos_seg, mov_prom, dpi=config.get('dpi', DPI_GRAFICOS)
+        )
         
         for titulo, grafico_data in graficos:
             elementos.append(Paragraph(titulo, estilo_subtitulo))
@@ -212,6 +298,7 @@ def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config):
     elementos.append(PageBreak())
     
     # Recomendaciones personalizadas
+    progreso(70, "Redactando recomendaciones")
     elementos.append(Paragraph("Recomendaciones Personalizadas", estilo_titulo))
     
     recomendaciones = generar_recomendaciones_personalizadas(
@@ -234,10 +321,43 @@ def generar_reporte_avanzado(nombre_usuario, duracion, metricas, config):
         elementos.append(Spacer(1, 0.1*inch))
         
     # Construir PDF con decoradores
-    doc.build(elementos, onFirstPage=_draw_first_page, onLaterPages=_draw_page_background)
+    progreso(85, "Construyendo PDF")
+    try:
+        doc.build(elementos, onFirstPage=_draw_first_page, onLaterPages=_draw_page_background)
+        os.replace(temporal, pdf_filename)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
     print(f"✅ PDF generado: {pdf_filename}")
+    limpiar_reportes(conservar=[pdf_filename])
     return pdf_filename
 
+def resumen_metricas(metricas, duracion):
+    """Métricas finales de una sesión (las del resumen ejecutivo del reporte)."""
+    frames_totales = max(1, metricas.get('frames_totales', 1))
+    contacto_pct = (metricas.get('frames_contacto', 0) / frames_totales) * 100
+    gestos_seg = metricas.get('gestos_totales', 0) / max(1, duracion)
+    
+    distancias = np.asarray(metricas.get('distancias_mov', []), dtype=float)
+    mov_prom = float(distancias.mean()) if distancias.size else 0
+    
+    posturas = np.asarray(metricas.get('postura_evaluacion', []), dtype=float)
+    postura_prom = float(posturas.mean()) if posturas.size else 5
+    
+    uso_espacio = metricas.get('uso_espacio', {'izquierda': 0, 'centro': 0, 'derecha': 0})
+    total_espacio = max(1, sum(uso_espacio.values()))
+    
+    return {
+        'puntuacion': calcular_puntuacion_general(metricas, contacto_pct, gestos_seg, mov_prom, postura_prom),
+        'contacto_pct': contacto_pct,
+        'gestos_seg': gestos_seg,
+        'movimiento': mov_prom,
+        'postura': postura_prom,
+        'izquierda_pct': uso_espacio.get('izquierda', 0) / total_espacio * 100,
+        'centro_pct': uso_espacio.get('centro', 0) / total_espacio * 100,
+        'derecha_pct': uso_espacio.get('derecha', 0) / total_espacio * 100,
+    }
+
 def calcular_puntuacion_general(metricas, contacto_pct, gestos_seg, mov_prom, postura_prom):
     """Calcular puntuación general sobre 100"""
     # Ponderaciones
@@ -283,108 +403,172 @@ def get_evaluacion_color(valor):
     else:
         return "Mejorar"
 
-def crear_graficos_avanzados(metricas, contacto_pct, gestos_seg, mov_prom):
-    """Crear gráficos avanzados para el reporte"""
+# Paneles del gráfico de evolución: (serie, título, unidad, color, etiqueta eje x)
+SERIES_EVOLUCION = (
+    ('contacto_por_tiempo', 'Contacto Visual', '%', 'b', ''),
+    ('gestos_por_tiempo', 'Gesticulación', 'Gestos/seg', 'g', ''),
+    ('mov_por_tiempo', 'Movimiento', 'Píxeles', 'r', 'Tiempo (seg)'),
+    ('postura_por_tiempo', 'Postura', 'Puntuación', 'm', 'Tiempo (seg)'),
+)
+
+# Puntos máximos por línea: acota el tiempo de dibujo sea cual sea la duración
+MAX_PUNTOS_SERIE = 600
+
+MARGENES = ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+
+CATEGORIAS_RADAR = ['Contacto\nVisual', 'Gestos', 'Movimiento', 'Postura', 'Uso del\nEspacio']
+
+# Plantillas de figuras por hilo: las figuras de matplotlib no se comparten
+# entre hilos, pero cada hilo reutiliza sus ejes y líneas entre reportes.
+_plantillas = threading.local()
+
+def _figura(figsize):
+    """Figura independiente de pyplot con su propio canvas Agg."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _png(fig, dpi):
+    img_data = io.BytesIO()
+    fig.savefig(img_data, format='png', dpi=dpi)
+    img_data.seek(0)
+    return img_data
+
+def reducir_serie(serie, max_puntos=MAX_PUNTOS_SERIE):
+    """Reduce una serie ``(t, valor)`` a como mucho ``max_puntos`` puntos.
+
+    El eje de tiempo se divide en intervalos iguales (unos ``max_puntos / 2``) y de
+    cada uno se conservan el mínimo y el máximo en orden temporal, así los
+    picos siguen viéndose. Devuelve ``(t, valores)``; una serie 1-D se toma
+    como muestreada a 1 muestra por segundo.
+    """
+    datos = np.asarray(serie, dtype=float)
+    if datos.ndim == 2:
+        t, valores = datos[:, 0], datos[:, 1]
+    else:
+        t, valores = np.arange(len(datos), dtype=float), datos
+    n = len(t)
+    if n <= max_puntos:
+        return t, valores
+
+    bordes = np.linspace(t[0], t[-1], (max_puntos - 2) // 2 + 1)[:-1]
+    inicios = np.unique(np.searchsorted(t, bordes))
+    tamanos = np.diff(np.append(inicios, n))
+    intervalo = np.repeat(np.arange(len(inicios)), tamanos)
+
+    # Ordenando por (intervalo, valor) el primero de cada intervalo es su
+    # mínimo y el último su máximo
+    orden = np.lexsort((valores, intervalo))
+    indices = np.unique(np.concatenate((orden[inicios], orden[inicios + tamanos - 1], [0, n - 1])))
+    return t[indices], valores[indices]
+
+def _plantilla_evolucion():
+    plantilla = getattr(_plantillas, 'evolucion', None)
+    if plantilla is None:
+        fig = _figura((8, 5))
+        ejes = [fig.add_subplot(2, 2, i + 1) for i in range(4)]
+        lineas = [ax.plot([], [], '-', linewidth=2)[0] for ax in ejes]
+        for ax in ejes:
+            ax.grid(True, alpha=0.3)
+        plantilla = _plantillas.evolucion = (fig, ejes, lineas)
+    return plantilla
+
+def _plantilla_radar():
+    plantilla = getattr(_plantillas, 'radar', None)
+    if plantilla is None:
+        fig = _figura((6, 6))
+        angulos = np.linspace(0, 2 * np.pi, len(CATEGORIAS_RADAR), endpoint=False)
+        ax = fig.add_subplot(111, projection='polar')
+        linea, = ax.plot([], [], 'o-', linewidth=2, color='#4CAF50')
+        relleno, = ax.fill([0], [0], alpha=0.25, color='#4CAF50')
+        ax.set_xticks(angulos)
+        ax.set_xticklabels(CATEGORIAS_RADAR)
+        ax.set_ylim(0, 100)
+        ax.set_title('Perfil de Competencias de Presentación', pad=20)
+        ax.grid(True)
+        plantilla = _plantillas.radar = (fig, angulos, linea, relleno)
+    return plantilla
+
+def _grafico_evolucion(series, dpi):
+    """Paneles 2x2 con las series presentes, en orden; los paneles sobrantes se ocultan."""
+    fig, ejes, lineas = _plantilla_evolucion()
+    presentes = [(series[clave], panel) for clave, *panel in SERIES_EVOLUCION if len(series[clave])]
+    for i, (ax, linea) in enumerate(zip(ejes, lineas)):
+        if i >= len(presentes):
+            ax.set_visible(False)
+            continue
+        serie, (titulo, unidad, color, etiqueta_x) = presentes[i]
+        ax.set_visible(True)
+        linea.set_data(*reducir_serie(serie))
+        linea.set_color(color)
+        ax.set_title(titulo)
+        ax.set_ylabel(unidad)
+        ax.set_xlabel(etiqueta_x)
+        ax.relim()
+        ax.autoscale_view()
+    # tight_layout parte de los márgenes actuales: se restauran los de fábrica
+    # para que reutilizar la plantilla dé siempre el mismo resultado.
+    from matplotlib import rcParams
+
+    fig.subplots_adjust(**{k: rcParams[f'figure.subplot.{k}'] for k in MARGENES})
+    fig.tight_layout()
+    return _png(fig, dpi)
+
+def _grafico_expresiones(expresiones, dpi):
+    # Las cuñas cambian en cada reporte: se reutiliza la figura y se vacía
+    fig = getattr(_plantillas, 'expresiones', None)
+    if fig is None:
+        fig = _plantillas.expresiones = _figura((6, 4))
+    fig.clear()
+    ax = fig.add_subplot(111)
+    ax.pie(list(expresiones.values()), labels=list(expresiones.keys()), autopct='%1.1f%%',
+           colors=['#ff9999', '#66b3ff', '#99ff99'])
+    ax.set_title('Distribución de Expresiones Faciales')
+    return _png(fig, dpi)
+
+def _grafico_radar(valores, dpi):
+    fig, angulos, linea, relleno = _plantilla_radar()
+    valores_plot = valores + [valores[0]]
+    angulos_plot = np.append(angulos, angulos[0])
+    linea.set_data(angulos_plot, valores_plot)
+    relleno.set_xy(np.column_stack((angulos_plot, valores_plot)))
+    return _png(fig, dpi)
+
+def crear_graficos_avanzados(metricas, contacto_pct, gestos_seg, mov_prom, dpi=DPI_GRAFICOS):
+    """Crear gráficos avanzados para el reporte
+
+    Cada gráfico se dibuja sobre su propia ``Figure`` (sin el estado global de
+    pyplot), reutilizando las plantillas del hilo. Se renderizan uno tras
+    otro: Agg retiene el GIL y los reportes ya se generan en procesos aparte.
+    """
     graficos = []
-    
+
     # Gráfico 1: Evolución temporal de métricas
-    contacto_tiempo = metricas.get('contacto_por_tiempo', [])
-    gestos_tiempo = metricas.get('gestos_por_tiempo', [])
-    mov_tiempo = metricas.get('mov_por_tiempo', [])
-    postura_tiempo = metricas.get('postura_por_tiempo', [])
-    
-    if any([contacto_tiempo, gestos_tiempo, mov_tiempo, postura_tiempo]):
-        plt.figure(figsize=(8, 5))
-        
-        # Determinar el número máximo de puntos de tiempo
-        max_tiempo = max(
-            len(contacto_tiempo) if contacto_tiempo else 0,
-            len(gestos_tiempo) if gestos_tiempo else 0,
-            len(mov_tiempo) if mov_tiempo else 0,
-            len(postura_tiempo) if postura_tiempo else 0
-        )
-        
-        if max_tiempo > 0:
-            tiempo = range(max_tiempo)
-            
-            subplot_num = 1
-            
-            if contacto_tiempo:
-                plt.subplot(2, 2, subplot_num)
-                plt.plot(range(len(contacto_tiempo)), contacto_tiempo, 'b-', linewidth=2)
-                plt.title('Contacto Visual')
-                plt.ylabel('%')
-                plt.grid(True, alpha=0.3)
-                subplot_num += 1
-            
-            if gestos_tiempo:
-                plt.subplot(2, 2, subplot_num)
-                plt.plot(range(len(gestos_tiempo)), gestos_tiempo, 'g-', linewidth=2)
-                plt.title('Gesticulación')
-                plt.ylabel('Gestos/seg')
-                plt.grid(True, alpha=0.3)
-                subplot_num += 1
-            
-            if mov_tiempo:
-                plt.subplot(2, 2, subplot_num)
-                plt.plot(range(len(mov_tiempo)), mov_tiempo, 'r-', linewidth=2)
-                plt.title('Movimiento')
-                plt.ylabel('Píxeles')
-                plt.xlabel('Tiempo (seg)')
-                plt.grid(True, alpha=0.3)
-                subplot_num += 1
-            
-            if postura_tiempo and subplot_num <= 4:
-                plt.subplot(2, 2, subplot_num)
-                plt.plot(range(len(postura_tiempo)), postura_tiempo, 'm-', linewidth=2)
-                plt.title('Postura')
-                plt.ylabel('Puntuación')
-                plt.xlabel('Tiempo (seg)')
-                plt.grid(True, alpha=0.3)
-                
-            plt.tight_layout()
-            
-            img_data = io.BytesIO()
-            plt.savefig(img_data, format='png', dpi=150)
-            img_data.seek(0)
-            plt.close()
-            
-            graficos.append(("Evolución Temporal de Métricas", img_data))
-        
+    series = {clave: metricas.get(clave, []) for clave, *_ in SERIES_EVOLUCION}
+    if any(len(serie) for serie in series.values()):
+        graficos.append(("Evolución Temporal de Métricas", _grafico_evolucion(series, dpi)))
+
     # Gráfico 2: Distribución de expresiones faciales
     expresiones = metricas.get('expresiones_faciales', {})
     if expresiones and sum(expresiones.values()) > 0:
-        plt.figure(figsize=(6, 4))
-        labels = list(expresiones.keys())
-        valores = list(expresiones.values())
-        
-        plt.pie(valores, labels=labels, autopct='%1.1f%%',
-                colors=['#ff9999', '#66b3ff', '#99ff99'])
-        plt.title('Distribución de Expresiones Faciales')
-        
-        img_data = io.BytesIO()
-        plt.savefig(img_data, format='png', dpi=150)
-        img_data.seek(0)
-        plt.close()
-        
-        graficos.append(("Análisis de Expresividad", img_data))
-        
+        graficos.append(("Análisis de Expresividad", _grafico_expresiones(expresiones, dpi)))
+
     # Gráfico 3: Radar de competencias
-    plt.figure(figsize=(6, 6))
-    
-    categorias = ['Contacto\nVisual', 'Gestos', 'Movimiento', 'Postura', 'Uso del\nEspacio']
-    
     # Calcular valores con manejo de errores
     postura_val = 50
-    if metricas.get('postura_evaluacion'):
-        postura_val = (sum(metricas['postura_evaluacion']) / len(metricas['postura_evaluacion'])) * 10
-    
+    posturas = np.asarray(metricas.get('postura_evaluacion', []), dtype=float)
+    if posturas.size:
+        postura_val = float(posturas.mean()) * 10
+
     espacio_val = 50
     uso_espacio = metricas.get('uso_espacio', {'izquierda': 0, 'centro': 0, 'derecha': 0})
     total_espacio = sum(uso_espacio.values())
     if total_espacio > 0 and uso_espacio.get('centro', 0) > total_espacio * 0.5:
         espacio_val = 80
-    
+
     valores = [
         min(100, contacto_pct),
         min(100, (gestos_seg / 1.5) * 100) if 0.5 < gestos_seg < 2 else 50,
@@ -392,27 +576,8 @@ def crear_graficos_avanzados(metricas, contacto_pct, gestos_seg, mov_prom):
         postura_val,
         espacio_val
     ]
-    
-    angulos = np.linspace(0, 2 * np.pi, len(categorias), endpoint=False)
-    valores_plot = valores + [valores[0]]
-    angulos_plot = np.append(angulos, angulos[0])
-    
-    ax = plt.subplot(111, projection='polar')
-    ax.plot(angulos_plot, valores_plot, 'o-', linewidth=2, color='#4CAF50')
-    ax.fill(angulos_plot, valores_plot, alpha=0.25, color='#4CAF50')
-    ax.set_xticks(angulos)
-    ax.set_xticklabels(categorias)
-    ax.set_ylim(0, 100)
-    ax.set_title('Perfil de Competencias de Presentación', pad=20)
-    ax.grid(True)
-    
-    img_data = io.BytesIO()
-    plt.savefig(img_data, format='png', dpi=150)
-    img_data.seek(0)
-    plt.close()
-    
-    graficos.append(("Perfil de Competencias", img_data))
-    
+    graficos.append(("Perfil de Competencias", _grafico_radar(valores, dpi)))
+
     return graficos
 
 def generar_recomendaciones_personalizadas(contacto_pct, gestos_seg, mov_prom, postura_prom, metricas):
@@ -0,0 +1,46 @@
+"""Retención de carpetas de archivos generados (reportes, grabaciones).
+
+Se borran los archivos más antiguos que ``max_dias`` y, si la carpeta sigue
+ocupando más de ``max_mb``, los más antiguos hasta bajar del límite. La fecha
+de modificación hace de último uso: quien quiera conservar un archivo usado
+recientemente solo tiene que renovarla (``os.utime``).
+"""
+import os
+import time
+
+
+def aplicar_retencion(directorio, extension, max_mb, max_dias, conservar=()):
+    """Aplica la retención a los ``*extension`` de ``directorio``; devuelve los borrados.
+
+    Las rutas de ``conservar`` no se borran aunque superen los límites.
+    """
+    ahora = time.time()
+    conservar = {os.path.abspath(ruta) for ruta in conservar}
+    archivos = []
+    try:
+        with os.scandir(directorio) as entradas:
+            for entrada in entradas:
+                if entrada.is_file() and entrada.name.endswith(extension):
+                    info = entrada.stat()
+                    archivos.append((info.st_mtime, info.st_size, entrada.path))
+    except FileNotFoundError:
+        return []
+
+    archivos.sort()
+    total = sum(tamano for _, tamano, _ in archivos)
+    limite = max_mb * 1024 * 1024
+    borrados = []
+    for mtime, tamano, ruta in archivos:
+        if ahora - mtime <= max_dias * 86400 and total <= limite:
+            break
+        if os.path.abspath(ruta) in conservar:
+            continue
+        try:
+            os.remove(ruta)
+        except OSError:
+            continue
+        total -= tamano
+        borrados.append(ruta)
+    if borrados:
+        print(f"🧹 {len(borrados)} archivos antiguos eliminados de {directorio}")
+    return borrados
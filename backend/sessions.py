@@ -0,0 +1,173 @@
+import asyncio
+import math
+import time
+
+from analysis import reset_metrics
+from pacing import FPS_OBJETIVO, FramePacer
+from pipeline import FrameAnalyzer
+
+# Rangos admitidos para los valores numéricos de la configuración que envía
+# el cliente: (mínimo, máximo, tipo)
+LIMITES_CONFIG = {
+    'dpi_reporte': (50, 300, int),
+    'fps_objetivo': (1, 30, float),
+    'deteccion_cada': (1, 30, int),
+}
+
+
+def normalizar_config(config):
+    """Copia de ``config`` con los valores numéricos dentro de ``LIMITES_CONFIG``.
+
+    Un valor fuera de rango se recorta al límite; uno que no es un número
+    finito se descarta y se usa el valor por defecto.
+    """
+    config = dict(config or {})
+    for clave, (minimo, maximo, tipo) in LIMITES_CONFIG.items():
+        if clave not in config:
+            continue
+        try:
+            valor = float(config[clave])
+        except (TypeError, ValueError):
+            valor = math.nan
+        if not math.isfinite(valor):
+            print(f"⚠️ Configuración '{clave}' no válida ({config[clave]!r}): se usa el valor por defecto")
+            del config[clave]
+            continue
+        acotado = tipo(min(maximo, max(minimo, valor)))
+        if not minimo <= valor <= maximo:
+            print(f"⚠️ Configuración '{clave}'={config[clave]!r} fuera de rango: se usa {acotado}")
+        config[clave] = acotado
+    return config
+
+
+class AnalysisSession:
+    """Estado de una sesión de análisis asociada a un cliente Socket.IO.
+
+    Cada cliente (identificado por su ``sid``) mantiene sus propias métricas,
+    configuración, temporizadores y ciclo de vida, de modo que un mismo proceso
+    puede atender varias sesiones concurrentes.
+    """
+
+    def __init__(self, sid, config, grabador=None):
+        self.sid = sid
+        self.config = config
+        # "browser" → el cliente envía los fotogramas; "camera" → ThreadedCamera local / IP
+        self.modo = "browser" if config.get("camera_type") == "browser" else "camera"
+        # Transporte de frames: "binary" (JPEG como adjunto binario) o "base64" (compatibilidad)
+        self.transporte = "binary" if config.get("transporte") == "binary" else "base64"
+        # Superposición: "jpeg" (frame anotado) o "vector" (solo cajas; el
+        # navegador ya tiene su vídeo y las dibuja encima)
+        self.overlay = "vector" if self.modo == "browser" and config.get("overlay") == "vector" else "jpeg"
+        self.metricas = reset_metrics()
+        self.inicio = time.time()
+        self.duracion = config.get("duracion", 30)
+        self.analizador = FrameAnalyzer(self.metricas, config)
+        # Registro por frame en disco (sobrevive a una caída del proceso). Se
+        # abre fuera del event loop con GrabadorSesion.para_sesion y llega ya creado.
+        self.grabador = grabador
+        self.analizador.grabador = grabador
+        # Ritmo de frames: plazo por frame y degradación de la vista previa
+        self.ritmo = FramePacer(config.get("fps_objetivo", FPS_OBJETIVO))
+        self.activa = True
+        self.tarea = None  # asyncio.Task del bucle de cámara (solo modo "camera")
+        self.ingesta = FrameSlot()  # último frame del navegador pendiente de analizar
+
+    def tiempo_transcurrido(self):
+        return time.time() - self.inicio
+
+    @property
+    def binario(self):
+        return self.transporte == "binary"
+
+    def detener(self):
+        self.activa = False
+        if self.grabador is not None:
+            # fsync + close en un hilo: no bloquean el event loop
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self.grabador.cerrar)
+            except RuntimeError:
+                self.grabador.cerrar()  # sin event loop (scripts)
+
+
+class FrameSlot:
+    """Ranura de ingesta "el último frame gana" para los frames del navegador.
+
+    Guarda como mucho un frame pendiente: si llega otro antes de que se haya
+    empezado a analizar, el anterior se descarta y se contabiliza. Así la
+    latencia queda acotada aunque la CPU no dé abasto.
+    """
+
+    def __init__(self):
+        self._pendiente = None
+        self.ocupada = False  # hay un consumidor procesando frames
+        self.recibidos = 0
+        self.descartados = 0
+
+    def depositar(self, frame):
+        """Deja ``frame`` en la ranura.
+
+        Devuelve True si nadie la está consumiendo y el llamador debe hacerlo.
+        """
+        self.recibidos += 1
+        if self._pendiente is not None:
+            self.descartados += 1
+        self._pendiente = frame
+        if self.ocupada:
+            return False
+        self.ocupada = True
+        return True
+
+    def tomar(self):
+        """Saca el frame pendiente; si no hay ninguno libera la ranura y devuelve None."""
+        frame, self._pendiente = self._pendiente, None
+        if frame is None:
+            self.ocupada = False
+        return frame
+
+
+class SessionManager:
+    """Registro de sesiones activas indexado por el ``sid`` de Socket.IO."""
+
+    def __init__(self):
+        self._sesiones = {}
+
+    def crear(self, sid, config, grabador=None):
+        """Crea una sesión nueva para ``sid``.
+
+        Devuelve ``None`` si el cliente ya tiene un análisis en curso.
+        """
+        if self.en_curso(sid):
+            return None
+        sesion = AnalysisSession(sid, config, grabador)
+        self._sesiones[sid] = sesion
+        return sesion
+
+    def obtener(self, sid):
+        return self._sesiones.get(sid)
+
+    def en_curso(self, sid):
+        actual = self._sesiones.get(sid)
+        return actual is not None and actual.activa
+
+    def cerrar(self, sid, sesion=None):
+        """Elimina la sesión de ``sid`` y la marca como detenida.
+
+        Si se indica ``sesion`` solo se elimina cuando coincide con la registrada,
+        evitando que un bucle antiguo cierre una sesión iniciada después.
+        Devuelve la sesión eliminada o ``None`` si no había nada que cerrar.
+        """
+        actual = self._sesiones.get(sid)
+        if actual is None or (sesion is not None and actual is not sesion):
+            return None
+        del self._sesiones[sid]
+        actual.detener()
+        return actual
+
+    def activas(self):
+        return [s for s in self._sesiones.values() if s.activa]
+
+    def __len__(self):
+        return len(self._sesiones)
+
+    def __contains__(self, sid):
+        return sid in self._sesiones
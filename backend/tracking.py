@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+
+# Puntos que se siguen dentro de la caja y mínimo para considerar válido el seguimiento
+MAX_PUNTOS = 60
+MIN_PUNTOS = 8
+
+
+class SeguidorPersona:
+    """Seguimiento ligero de la caja de la persona con flujo óptico (Lucas-Kanade).
+
+    Entre dos detecciones de YOLO se siguen puntos característicos dentro de la
+    caja y se desplaza la caja según la mediana de su movimiento. Solo usa
+    funciones del núcleo de OpenCV (no requiere opencv-contrib).
+    """
+
+    def __init__(self):
+        self.bbox = None
+        self.confianza = 0.0
+        self._gris = None
+        self._puntos = None
+        self._n_iniciales = 0
+
+    def iniciar(self, frame, bbox):
+        """Arranca el seguimiento desde ``bbox`` (x1, y1, x2, y2, ...). Devuelve True si hay puntos."""
+        gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        alto, ancho = gris.shape
+        x1, y1, x2, y2 = [int(v) for v in bbox[:4]]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(ancho, x2), min(alto, y2)
+
+        self.bbox = None
+        self.confianza = 0.0
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return False
+
+        mascara = np.zeros_like(gris)
+        mascara[y1:y2, x1:x2] = 255
+        puntos = cv2.goodFeaturesToTrack(gris, MAX_PUNTOS, 0.01, 5, mask=mascara)
+        if puntos is None or len(puntos) < MIN_PUNTOS:
+            return False
+
+        self._gris = gris
+        self._puntos = puntos
+        self._n_iniciales = len(puntos)
+        self.bbox = tuple(float(v) for v in bbox[:4])
+        self.confianza = 1.0
+        return True
+
+    def actualizar(self, frame):
+        """Sigue la caja en ``frame``.
+
+        Devuelve ``(x1, y1, x2, y2, cx, cy)`` o None si se perdió el seguimiento.
+        """
+        if self.bbox is None:
+            return None
+
+        gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        nuevos, estado, _ = cv2.calcOpticalFlowPyrLK(self._gris, gris, self._puntos, None)
+        if nuevos is None:
+            self.bbox = None
+            return None
+
+        ok = estado.reshape(-1) == 1
+        previos = self._puntos.reshape(-1, 2)[ok]
+        actuales = nuevos.reshape(-1, 2)[ok]
+        self.confianza = len(actuales) / max(1, self._n_iniciales)
+        if len(actuales) < MIN_PUNTOS:
+            self.bbox = None
+            return None
+
+        dx, dy = np.median(actuales - previos, axis=0)
+        x1, y1, x2, y2 = self.bbox
+        self.bbox = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+        self._gris = gris
+        self._puntos = actuales.reshape(-1, 1, 2)
+
+        x1, y1, x2, y2 = self.bbox
+        return (x1, y1, x2, y2, (x1 + x2) / 2, (y1 + y2) / 2)
+
+
+class CadenciaDeteccion:
+    """Decide en qué frames se ejecuta YOLO completo y en cuáles basta con seguir la caja.
+
+    Con ``cada_n=1`` se detecta en todos los frames (comportamiento original).
+    Con ``cada_n=N`` se detecta uno de cada N frames y entre medias se usa
+    ``SeguidorPersona``; si la confianza del seguimiento cae por debajo de
+    ``confianza_minima`` (o se pierde la caja) se vuelve a detectar enseguida.
+    """
+
+    def __init__(self, cada_n=1, confianza_minima=0.5):
+        self.cada_n = max(1, int(cada_n or 1))
+        self.confianza_minima = confianza_minima
+        self.seguidor = SeguidorPersona()
+        self._desde_deteccion = 0
+        self.detecciones = 0
+        self.seguimientos = 0
+        # Contacto visual de la última detección; el motor de pose lo reutiliza
+        # en los frames seguidos (no tiene keypoints de la cara entre medias)
+        self.contacto = None
+
+    def debe_detectar(self):
+        return (
+            self.cada_n <= 1
+            or self.seguidor.bbox is None
+            or self._desde_deteccion >= self.cada_n - 1
+        )
+
+    def tras_deteccion(self, frame, bbox_persona):
+        """Registra una detección completa y reinicia el seguidor desde su caja."""
+        self.detecciones += 1
+        self._desde_deteccion = 0
+        if self.cada_n > 1 and bbox_persona is not None:
+            self.seguidor.iniciar(frame, bbox_persona)
+        else:
+            self.seguidor.bbox = None
+
+    def seguir(self, frame):
+        """Actualiza la caja con el seguidor; None si hay que volver a detectar."""
+        bbox = self.seguidor.actualizar(frame)
+        if bbox is None or self.seguidor.confianza < self.confianza_minima:
+            self.seguidor.bbox = None
+            return None
+        self._desde_deteccion += 1
+        self.seguimientos += 1
+        return bbox
@@ -1,6 +1,9 @@
 import { defineStore } from 'pinia'
 import { io } from 'socket.io-client'
 
+// Máximo de frames enviados sin confirmar (frame_ack) antes de pausar el envío
+const MAX_FRAMES_EN_VUELO = 2
+
 export const useAnalysisStore = defineStore('analysis', {
   state: () => ({
     socket: null,
@@ -14,6 +17,10 @@ export const useAnalysisStore = defineStore('analysis', {
       duracion: 30,
       guardar_video: true,
       analisis_avanzado: true,
+      transporte: 'binary', // 'binary' (JPEG crudo) | 'base64' (compatibilidad)
+      deteccion_cada: 3,    // YOLO cada N frames; entre medias se sigue la caja
+      fps_objetivo: 15,     // plazo por frame del servidor
+      overlay: 'vector',    // cámara del navegador: 'vector' (cajas) | 'jpeg' (frame anotado)
     },
     liveMetrics: {
       contacto: 0,
@@ -24,9 +31,16 @@ export const useAnalysisStore = defineStore('analysis', {
       fluidez: 0,
       progreso: 0,
       tiempo_actual: 0,
+      fps: 0,               // fps conseguidos por el servidor
+      degradacion: 'normal',
     },
     videoFrame: null,
+    overlay: null,        // superposición acordada en start_analysis
+    overlayData: null,    // última superposición vectorial { ancho, alto, cajas, persona, contacto }
     reportPath: null,
+    reportUrl: null,      // descarga del PDF vía HTTP (/reports/<job_id>)
+    reportProgress: null, // { progreso, mensaje } mientras se genera
+    backendUrl: null,
     error: null,
     statusMessage: null,
     notification: {
@@ -37,8 +51,17 @@ export const useAnalysisStore = defineStore('analysis', {
     // 📷 Streaming desde el navegador
     localStream: null,
     browserTimer: null,
+    transporte: null,   // modo acordado con el servidor en start_analysis
+    frameSeq: 0,        // último frame enviado
+    frameAckSeq: 0,     // último frame consumido por el servidor
+    framesDescartados: 0,
   }),
 
+  getters: {
+    // Hay vídeo que mostrar: frame anotado del servidor o la cámara local con superposición
+    hasLiveVideo: (state) => !!state.videoFrame || (state.overlay === 'vector' && !!state.localStream),
+  },
+
   actions: {
     connect() {
       // Determinar URL del backend.
@@ -51,6 +74,7 @@ export const useAnalysisStore = defineStore('analysis', {
         : 'http://localhost:8000'
 
       const backendUrl = import.meta.env.VITE_BACKEND_URL || defaultHost
+      this.backendUrl = backendUrl
 
       // Conectar al backend de FastAPI usando la URL determinada
       this.socket = io(backendUrl)
@@ -78,12 +102,35 @@ export const useAnalysisStore = defineStore('analysis', {
       })
 
       this.socket.on('video_frame', (data) => {
-        this.videoFrame = `data:image/jpeg;base64,${data.image}`
+        if (typeof data.image === 'string') {
+          this.setVideoFrame(`data:image/jpeg;base64,${data.image}`)
+        } else {
+          // Modo binario: el JPEG llega como ArrayBuffer
+          const blob = new Blob([data.image], { type: 'image/jpeg' })
+          this.setVideoFrame(URL.createObjectURL(blob))
+        }
+      })
+
+      this.socket.on('overlay', (data) => {
+        this.overlayData = data
+      })
+
+      this.socket.on('frame_ack', (data) => {
+        if (typeof data.seq === 'number') {
+          this.frameAckSeq = Math.max(this.frameAckSeq, data.seq)
+        }
+        this.framesDescartados = data.descartados || 0
+      })
+
+      this.socket.on('report_progress', (data) => {
+        this.reportProgress = { progreso: data.progreso, mensaje: data.mensaje }
       })
 
       this.socket.on('report_generated', (data) => {
         console.log(`📄 Reporte generado: ${data.file_path}`)
         this.reportPath = data.file_path
+        this.reportUrl = data.url ? `${this.backendUrl}${data.url}` : null
+        this.reportProgress = null
         this.showNotification(`Reporte generado con éxito.`)
       })
       
@@ -113,6 +160,8 @@ export const useAnalysisStore = defineStore('analysis', {
         console.log('▶️ Enviando evento start_analysis con config:', this.config)
         this.isAnalyzing = true
         this.reportPath = null
+        this.reportUrl = null
+        this.reportProgress = null
         this.error = null
         this.statusMessage = "Solicitando inicio de análisis...";
 
@@ -125,7 +174,17 @@ export const useAnalysisStore = defineStore('analysis', {
           }
         }
 
-        this.socket.emit('start_analysis', this.config)
+        this.transporte = null
+        this.overlay = null
+        this.overlayData = null
+        this.socket.emit('start_analysis', this.config, (resp) => {
+          if (!resp || !resp.ok) return
+          // Transporte acordado; los frames enviados antes de crear la sesión
+          // se ignoraron en el servidor, así que se reinician los créditos
+          this.transporte = resp.transporte || 'base64'
+          this.overlay = resp.overlay || 'jpeg'
+          this.frameAckSeq = this.frameSeq
+        })
       } else {
         console.error('No se puede iniciar el análisis, no hay conexión de socket.')
         this.error = 'No estás conectado al servidor.'
@@ -178,13 +237,27 @@ export const useAnalysisStore = defineStore('analysis', {
         canvas.height = vh
         const ctx = canvas.getContext('2d')
 
-        // Enviar ~10fps para balancear calidad y ancho de banda
+        // Enviar hasta ~10fps; si el servidor va atrasado (frames sin confirmar)
+        // se omite el tick para no acumular latencia
+        this.frameSeq = 0
+        this.frameAckSeq = 0
+        this.framesDescartados = 0
         this.browserTimer = setInterval(() => {
+          if (!this.socket || !this.isConnected || !this.transporte) return
+          if (this.frameSeq - this.frameAckSeq >= MAX_FRAMES_EN_VUELO) return
           ctx.drawImage(videoEl, 0, 0, canvas.width, canvas.height)
-          const dataURL = canvas.toDataURL('image/jpeg', 0.7)
-          const base64 = dataURL.split(',')[1]
-          if (this.socket && this.isConnected) {
-            this.socket.emit('browser_frame', { image: base64 })
+          const seq = ++this.frameSeq
+          if (this.transporte === 'binary') {
+            // JPEG crudo como adjunto binario, sin pasar por base64
+            canvas.toBlob(async (blob) => {
+              if (!blob || !this.socket) return
+              const image = await blob.arrayBuffer()
+              this.socket.emit('browser_frame', { image, seq })
+            }, 'image/jpeg', 0.7)
+          } else {
+            const dataURL = canvas.toDataURL('image/jpeg', 0.7)
+            const base64 = dataURL.split(',')[1]
+            this.socket.emit('browser_frame', { image: base64, seq })
           }
         }, 100)
         return true
@@ -208,6 +281,14 @@ export const useAnalysisStore = defineStore('analysis', {
       }
     },
 
+    setVideoFrame(src) {
+      // Liberar la URL del frame anterior si era un Blob (modo binario)
+      if (this.videoFrame && this.videoFrame.startsWith('blob:')) {
+        URL.revokeObjectURL(this.videoFrame)
+      }
+      this.videoFrame = src
+    },
+
     showNotification(message, type = 'success') {
       this.notification.message = message;
       this.notification.type = type;
@@ -233,9 +314,14 @@ export const useAnalysisStore = defineStore('analysis', {
             fluidez: 0,
             progreso: 0,
             tiempo_actual: 0,
+            fps: 0,
+            degradacion: 'normal',
         };
-        this.videoFrame = null;
+        this.setVideoFrame(null);
+        this.overlayData = null;
         this.reportPath = null;
+        this.reportUrl = null;
+        this.reportProgress = null;
         this.error = null;
         this.statusMessage = null;
     }